@@ -98,6 +98,31 @@ DATABASES = {
 }
 
 
+# Cache
+# Every process (web workers, process_payments) must share one cache: cart
+# badges, variant stock and the dashboard snapshot are written by one process
+# and read by the others. The database cache works out of the box (its table is
+# created by migrate); set REDIS_URL in production for a faster shared cache.
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'django_cache',
+            # Past MAX_ENTRIES every set culls keys in alphabetical order, which evicts the
+            # dashboard snapshot and its rebuild lock first. Keep it out of reach and drop
+            # expired rows with the prune_cache command instead.
+            'OPTIONS': {'MAX_ENTRIES': 1000000},
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -150,11 +175,28 @@ LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'core:home'
 LOGOUT_REDIRECT_URL = 'core:home'
 
+# Seconds the admin dashboard figures are cached and shared between staff
+ADMIN_DASHBOARD_CACHE_TTL = int(os.getenv('ADMIN_DASHBOARD_CACHE_TTL', 60))
+
+# Namespaces whose pages never show the storefront cart; cart_context skips them entirely
+CART_CONTEXT_EXCLUDED_NAMESPACES = ['admin_panel']
+
+# Distinct per server (0-1023) so order numbers and payment references can never collide across hosts
+IDENTIFIER_HOST_ID = os.getenv('IDENTIFIER_HOST_ID')
+
 # Paystack Configuration
 PAYSTACK_SECRET_KEY = os.getenv('PAYSTACK_SECRET_KEY', 'sk_test_your_key_here')
 PAYSTACK_PUBLIC_KEY = os.getenv('PAYSTACK_PUBLIC_KEY', 'pk_test_your_key_here')
 PAYSTACK_LIVE_SECRET_KEY = os.getenv('PAYSTACK_LIVE_SECRET_KEY', '')
 PAYSTACK_LIVE_PUBLIC_KEY = os.getenv('PAYSTACK_LIVE_PUBLIC_KEY', '')
+PAYSTACK_BASE_URL = os.getenv('PAYSTACK_BASE_URL', 'https://api.paystack.co')
+# Dotted path to the client class; point it at a fake to run checkout offline
+PAYSTACK_CLIENT = 'payments.paystack.PaystackClient'
+PAYSTACK_CONNECT_TIMEOUT = 3.05
+PAYSTACK_READ_TIMEOUT = 10
+PAYSTACK_MAX_RETRIES = 2
+PAYSTACK_RETRY_BACKOFF = 0.5
+PAYSTACK_POOL_SIZE = 10
 
 # Email Configuration
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
@@ -0,0 +1,132 @@
+"""
+Cached snapshot of the admin dashboard.
+
+The figures are computed at most once per ADMIN_DASHBOARD_CACHE_TTL seconds
+and shared by every staff member. When the snapshot goes stale, a single
+request takes a short cache lock and rebuilds it; everyone else keeps
+getting the stale copy meanwhile, or waits for the first copy on a cold
+cache, so simultaneous refreshes never pile identical aggregate queries onto
+the orders tables. The lock needs a cache shared by every web worker.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+from core.models import Category, Product, ProductVariant, Order, OrderDailyStats
+from payments.models import Payment
+from users.models import UserProfile
+
+SNAPSHOT_CACHE_KEY = 'admin_panel:dashboard:snapshot'
+REBUILD_LOCK_KEY = 'admin_panel:dashboard:rebuilding'
+# How long a stale snapshot may still be served while it is being rebuilt
+STALE_GRACE_PERIOD = 60 * 10
+# Upper bound for one rebuild; the lock expires on its own if a worker dies
+REBUILD_LOCK_TIMEOUT = 30
+# How often a request waiting on the first build checks for its snapshot
+REBUILD_POLL_INTERVAL = 0.1
+
+
+def get_dashboard_snapshot(force_refresh=False):
+    """
+    Return the dashboard context, including computed_at. Only the request
+    holding the lock builds: with a stale snapshot (or force_refresh) the
+    others serve the cached copy, and with none at all they wait for the
+    builder's snapshot instead of running the same queries themselves.
+    """
+    snapshot = cache.get(SNAPSHOT_CACHE_KEY)
+    if snapshot is not None and not force_refresh and timezone.now() < snapshot['expires_at']:
+        return snapshot
+
+    while True:
+        if cache.add(REBUILD_LOCK_KEY, True, REBUILD_LOCK_TIMEOUT):
+            try:
+                # The previous holder may have stored a new snapshot just before releasing the lock
+                latest = cache.get(SNAPSHOT_CACHE_KEY)
+                if latest is not None and (snapshot is None or latest['computed_at'] != snapshot['computed_at']):
+                    return latest
+                return _build_and_store()
+            finally:
+                cache.delete(REBUILD_LOCK_KEY)
+
+        # Another request is rebuilding; serve what we have
+        if snapshot is not None:
+            return snapshot
+        # Cold cache: poll until its snapshot lands, or the lock frees up because the builder failed
+        time.sleep(REBUILD_POLL_INTERVAL)
+        snapshot = cache.get(SNAPSHOT_CACHE_KEY)
+        if snapshot is not None:
+            return snapshot
+
+
+def _build_and_store():
+    ttl = settings.ADMIN_DASHBOARD_CACHE_TTL
+    snapshot = build_dashboard_context()
+    snapshot['computed_at'] = timezone.now()
+    snapshot['expires_at'] = snapshot['computed_at'] + timedelta(seconds=ttl)
+    cache.set(SNAPSHOT_CACHE_KEY, snapshot, ttl + STALE_GRACE_PERIOD)
+    return snapshot
+
+
+def build_dashboard_context():
+    """Compute every dashboard figure from the database"""
+    # Get date ranges (local calendar days, as the rollups are keyed)
+    today = timezone.localdate()
+    last_7_days = today - timedelta(days=7)
+    last_30_days = today - timedelta(days=30)
+
+    # Statistics
+    total_products = Product.objects.count()
+    total_categories = Category.objects.count()
+    total_users = UserProfile.objects.count()
+
+    # Order counts by status and revenue windows, from the daily rollup in one query
+    revenue = Q(status__in=Order.REVENUE_STATUSES)
+    order_stats = OrderDailyStats.objects.aggregate(
+        total_orders=Sum('order_count'),
+        **{
+            f'{status}_orders': Sum('order_count', filter=Q(status=status))
+            for status in ('pending', 'paid', 'processing', 'shipped', 'delivered')
+        },
+        total_revenue=Sum('revenue', filter=revenue),
+        revenue_today=Sum('revenue', filter=revenue & Q(date__gte=today)),
+        revenue_last_7_days=Sum('revenue', filter=revenue & Q(date__gte=last_7_days)),
+        revenue_last_30_days=Sum('revenue', filter=revenue & Q(date__gte=last_30_days)),
+    )
+    order_stats = {key: value or 0 for key, value in order_stats.items()}
+
+    # Recent orders
+    recent_orders = list(Order.objects.select_related('user').order_by('-created_at')[:10])
+
+    # Low stock alerts
+    low_stock_variants = list(ProductVariant.objects.filter(
+        stock__lt=5
+    ).select_related('product').order_by('stock')[:10])
+
+    # Top selling products, from the per-product daily rollup
+    top_products = list(Product.objects.select_related('category').annotate(
+        total_sold=Sum('daily_sales__quantity')
+    ).filter(
+        total_sold__gt=0
+    ).order_by('-total_sold')[:10])
+
+    # Payment statistics, in one conditional aggregate
+    payment_stats = Payment.objects.aggregate(
+        total_payments=Count('id'),
+        successful_payments=Count('id', filter=Q(status='success')),
+        pending_payments=Count('id', filter=Q(status='pending')),
+        failed_payments=Count('id', filter=Q(status='failed')),
+    )
+
+    return {
+        'total_products': total_products,
+        'total_categories': total_categories,
+        'total_users': total_users,
+        'recent_orders': recent_orders,
+        'low_stock_variants': low_stock_variants,
+        'top_products': top_products,
+        **order_stats,
+        **payment_stats,
+    }
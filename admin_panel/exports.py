@@ -0,0 +1,124 @@
+"""
+Streaming exports of orders and order lines for accounting, and of the
+current inventory for the bulk inventory upload.
+
+Rows are produced lazily for StreamingHttpResponse: orders are read with
+.iterator() in chunks of EXPORT_CHUNK_SIZE, and line exports prefetch each
+chunk's items in one query, so memory stays flat however long the date range
+is. A CSV header goes out before the first query runs.
+"""
+import csv
+import json
+from datetime import datetime, time, timedelta
+
+from django.db.models import Prefetch
+from django.utils import timezone
+from core.models import Order, OrderItem, ProductVariant
+
+EXPORT_CHUNK_SIZE = 500
+# Rows are joined into chunks of this many before being handed to the server
+ROWS_PER_WRITE = 100
+
+ORDER_FIELDS = [
+    'order_number', 'created_at', 'status', 'customer', 'full_name', 'email', 'phone',
+    'address', 'city', 'state', 'postal_code', 'country', 'total_price',
+]
+LINE_FIELDS = [
+    'order_number', 'created_at', 'status', 'product', 'size', 'color',
+    'quantity', 'unit_price', 'line_total',
+]
+
+VARIANT_FIELDS = ['variant_id', 'product', 'size', 'color', 'stock', 'price_override']
+
+
+def get_export_orders(start_date, end_date, status=''):
+    """Orders placed on the local days from start_date to end_date inclusive, oldest first"""
+    start = timezone.make_aware(datetime.combine(start_date, time.min))
+    end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min))
+    orders = Order.objects.filter(created_at__gte=start, created_at__lt=end)
+    if status:
+        orders = orders.filter(status=status)
+    return orders.order_by('created_at', 'id')
+
+
+def order_rows(orders):
+    for order in orders.select_related('user').iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield {
+            'order_number': order.order_number,
+            'created_at': timezone.localtime(order.created_at).isoformat(),
+            'status': order.status,
+            'customer': order.user.username,
+            'full_name': order.full_name,
+            'email': order.email,
+            'phone': order.phone,
+            'address': order.address,
+            'city': order.city,
+            'state': order.state,
+            'postal_code': order.postal_code,
+            'country': order.country,
+            'total_price': str(order.total_price),
+        }
+
+
+def line_rows(orders):
+    items = OrderItem.objects.select_related('product', 'variant').order_by('id')
+    orders = orders.only('order_number', 'created_at', 'status').prefetch_related(Prefetch('items', queryset=items))
+    for order in orders.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        created_at = timezone.localtime(order.created_at).isoformat()
+        for item in order.items.all():
+            variant = item.variant
+            yield {
+                'order_number': order.order_number,
+                'created_at': created_at,
+                'status': order.status,
+                'product': item.product.name if item.product else 'Deleted Product',
+                'size': variant.size if variant else '',
+                'color': variant.color if variant else '',
+                'quantity': item.quantity,
+                'unit_price': str(item.price),
+                'line_total': str(item.get_total_price()),
+            }
+
+
+def inventory_rows():
+    """Every variant's current stock and price override, in the layout the inventory upload reads"""
+    variants = ProductVariant.objects.order_by('product__name', 'product_id', 'color', 'size').values_list(
+        'id', 'product__name', 'size', 'color', 'stock', 'price_override'
+    )
+    for variant_id, product, size, color, stock, price_override in variants.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield {
+            'variant_id': variant_id,
+            'product': product,
+            'size': size,
+            'color': color,
+            'stock': stock,
+            'price_override': '' if price_override is None else str(price_override),
+        }
+
+
+def stream_csv(fields, rows):
+    writer = csv.DictWriter(_Echo(), fieldnames=fields)
+    yield writer.writeheader()
+    yield from _batched(writer.writerow(row) for row in rows)
+
+
+def stream_jsonl(rows):
+    yield from _batched(json.dumps(row) + '\n' for row in rows)
+
+
+def _batched(lines):
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= ROWS_PER_WRITE:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+class _Echo:
+    """File-like object whose write() hands back the line csv.writer formatted"""
+
+    def write(self, value):
+        return value
@@ -66,3 +66,44 @@ class OrderStatusForm(forms.Form):
         choices=Order.STATUS_CHOICES,
         widget=forms.Select(attrs={'class': 'form-control'})
     )
+
+
+class OrderExportForm(forms.Form):
+    EXPORT_CHOICES = [
+        ('orders', 'Orders'),
+        ('lines', 'Order lines'),
+    ]
+    FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('jsonl', 'JSON Lines'),
+    ]
+
+    start_date = forms.DateField(widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}))
+    end_date = forms.DateField(widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}))
+    status = forms.ChoiceField(
+        choices=[('', 'All Statuses')] + Order.STATUS_CHOICES,
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    export = forms.ChoiceField(
+        choices=EXPORT_CHOICES,
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    file_format = forms.ChoiceField(
+        choices=FORMAT_CHOICES,
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+
+    def clean_end_date(self):
+        start_date = self.cleaned_data.get('start_date')
+        end_date = self.cleaned_data.get('end_date')
+        if start_date and end_date < start_date:
+            raise forms.ValidationError("End date cannot be before the start date")
+        return end_date
+
+
+class InventoryUploadForm(forms.Form):
+    csv_file = forms.FileField(
+        label='CSV file',
+        widget=forms.FileInput(attrs={'class': 'form-control', 'accept': '.csv,text/csv'})
+    )
@@ -28,6 +28,11 @@ urlpatterns = [
     path('variants/<int:variant_id>/edit/', views.variant_edit, name='variant_edit'),
     path('variants/<int:variant_id>/delete/', views.variant_delete, name='variant_delete'),
 
+    # Inventory
+    path('inventory/', views.inventory_edit, name='inventory_edit'),
+    path('inventory/upload/', views.inventory_upload, name='inventory_upload'),
+    path('inventory/download/', views.inventory_download, name='inventory_download'),
+
     # Product Images
     path('products/<int:product_id>/images/add/', views.image_add, name='image_add'),
     path('images/<int:image_id>/delete/', views.image_delete, name='image_delete'),
@@ -35,6 +40,7 @@ urlpatterns = [
 
     # Orders
     path('orders/', views.order_list, name='order_list'),
+    path('orders/export/', views.order_export, name='order_export'),
     path('orders/<int:order_id>/', views.order_detail, name='order_detail'),
     path('orders/<int:order_id>/status/', views.order_update_status, name='order_update_status'),
 
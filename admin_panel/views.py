@@ -3,18 +3,28 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
 from django.contrib import messages
+from django.core.paginator import Paginator
+from django.db import transaction
 from django.db.models import Sum, Count, F, Q
 from django.db.models.functions import TruncDate
 from django.utils import timezone
 from django.utils.text import slugify
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from datetime import timedelta
 from core.models import Category, Product, ProductVariant, ProductImage, Order, OrderItem
+from core.inventory import INVENTORY_FIELDS, InventoryUpdateError, parse_inventory_csv, update_inventory
+from core.rollups import count_orders, record_status_change
+from core.search import search_products
 from payments.models import Payment
 from users.models import UserProfile
+from .dashboard import get_dashboard_snapshot
+from .exports import (
+    LINE_FIELDS, ORDER_FIELDS, VARIANT_FIELDS, get_export_orders,
+    inventory_rows, line_rows, order_rows, stream_csv, stream_jsonl
+)
 from .forms import (
     CategoryForm, ProductForm, ProductVariantForm,
-    ProductImageForm, OrderStatusForm
+    ProductImageForm, OrderStatusForm, OrderExportForm, InventoryUploadForm
 )
 
 
@@ -57,86 +67,8 @@ def dashboard(request):
         messages.error(request, 'Access denied.')
         return redirect('core:home')
 
-    # Get date ranges
-    today = timezone.now().date()
-    last_7_days = today - timedelta(days=7)
-    last_30_days = today - timedelta(days=30)
-
-    # Statistics
-    total_products = Product.objects.count()
-    total_categories = Category.objects.count()
-    total_users = UserProfile.objects.count()
-    total_orders = Order.objects.count()
-
-    # Orders by status
-    pending_orders = Order.objects.filter(status='pending').count()
-    paid_orders = Order.objects.filter(status='paid').count()
-    processing_orders = Order.objects.filter(status='processing').count()
-    shipped_orders = Order.objects.filter(status='shipped').count()
-    delivered_orders = Order.objects.filter(status='delivered').count()
-
-    # Revenue calculations
-    total_revenue = Order.objects.filter(status__in=['paid', 'processing', 'shipped', 'delivered']).aggregate(
-        total=Sum('total_price'))['total'] or 0
-
-    revenue_today = Order.objects.filter(
-        created_at__date=today,
-        status__in=['paid', 'processing', 'shipped', 'delivered']
-    ).aggregate(total=Sum('total_price'))['total'] or 0
-
-    revenue_last_7_days = Order.objects.filter(
-        created_at__gte=last_7_days,
-        status__in=['paid', 'processing', 'shipped', 'delivered']
-    ).aggregate(total=Sum('total_price'))['total'] or 0
-
-    revenue_last_30_days = Order.objects.filter(
-        created_at__gte=last_30_days,
-        status__in=['paid', 'processing', 'shipped', 'delivered']
-    ).aggregate(total=Sum('total_price'))['total'] or 0
-
-    # Recent orders
-    recent_orders = Order.objects.select_related('user').order_by('-created_at')[:10]
-
-    # Low stock alerts
-    low_stock_variants = ProductVariant.objects.filter(
-        stock__lt=5
-    ).select_related('product').order_by('stock')[:10]
-
-    # Top selling products
-    top_products = Product.objects.annotate(
-        total_sold=Sum(F('variants__orderitem__quantity'))
-    ).filter(
-        variants__orderitem__isnull=False
-    ).order_by('-total_sold')[:10]
-
-    # Payment statistics
-    total_payments = Payment.objects.count()
-    successful_payments = Payment.objects.filter(status='success').count()
-    pending_payments = Payment.objects.filter(status='pending').count()
-    failed_payments = Payment.objects.filter(status='failed').count()
-
-    context = {
-        'total_products': total_products,
-        'total_categories': total_categories,
-        'total_users': total_users,
-        'total_orders': total_orders,
-        'pending_orders': pending_orders,
-        'paid_orders': paid_orders,
-        'processing_orders': processing_orders,
-        'shipped_orders': shipped_orders,
-        'delivered_orders': delivered_orders,
-        'total_revenue': total_revenue,
-        'revenue_today': revenue_today,
-        'revenue_last_7_days': revenue_last_7_days,
-        'revenue_last_30_days': revenue_last_30_days,
-        'recent_orders': recent_orders,
-        'low_stock_variants': low_stock_variants,
-        'top_products': top_products,
-        'total_payments': total_payments,
-        'successful_payments': successful_payments,
-        'pending_payments': pending_payments,
-        'failed_payments': failed_payments,
-    }
+    force_refresh = request.GET.get('refresh') == '1'
+    context = get_dashboard_snapshot(force_refresh=force_refresh)
 
     return render(request, 'admin_panel/dashboard.html', context)
 
@@ -231,36 +163,77 @@ def category_delete(request, category_id):
 
 # ==================== PRODUCTS ====================
 
+ADMIN_PRODUCTS_PER_PAGE = 25
+
+# Every ordering ends on id so pages are stable, and each is backed by an index on Product
+ADMIN_PRODUCT_SORT_ORDERINGS = {
+    'newest': ('-created_at', '-id'),
+    'oldest': ('created_at', 'id'),
+    'name': ('name', 'id'),
+    '-name': ('-name', '-id'),
+    'price': ('price', 'id'),
+    '-price': ('-price', '-id'),
+    'relevance': ('-search_rank', '-id'),
+}
+
 @login_required(login_url='admin_panel:login')
 def product_list(request):
     if not request.user.is_staff:
         return redirect('core:home')
 
-    products = Product.objects.select_related('category').all().order_by('-created_at')
+    products = Product.objects.select_related('category')
     search_query = request.GET.get('search', '')
     category_filter = request.GET.get('category', '')
+    sort_by = request.GET.get('sort', 'relevance' if search_query else 'newest')
 
     if search_query:
-        products = products.filter(
-            Q(name__icontains=search_query) |
-            Q(description__icontains=search_query)
-        )
+        products = search_products(products, search_query)
 
     if category_filter:
         products = products.filter(category_id=category_filter)
 
+    if sort_by not in ADMIN_PRODUCT_SORT_ORDERINGS or (sort_by == 'relevance' and not search_query):
+        sort_by = 'newest'
+    products = products.order_by(*ADMIN_PRODUCT_SORT_ORDERINGS[sort_by])
+
+    # Paginate the plain rows, then aggregate stock for just this page
+    page = Paginator(products, ADMIN_PRODUCTS_PER_PAGE).get_page(request.GET.get('page'))
+    page.object_list = attach_stock_summary(list(page.object_list))
+
     categories = Category.objects.all()
 
+    # Preserve the active filters in sort and page links
+    query_params = request.GET.copy()
+    query_params.pop('page', None)
+    query_params.pop('sort', None)
+
     context = {
-        'products': products,
+        'products': page,
+        'page': page,
+        'query_params': query_params.urlencode(),
         'categories': categories,
         'search_query': search_query,
         'category_filter': category_filter,
+        'sort_by': sort_by,
         'section': 'products',
     }
     return render(request, 'admin_panel/products/list.html', context)
 
 
+def attach_stock_summary(products):
+    """Set total_stock and variant_count on a page of products with one grouped query"""
+    summary = {
+        row['id']: row
+        for row in Product.objects.filter(pk__in=[product.pk for product in products])
+        .with_card_data().values('id', 'total_stock', 'variant_count')
+    }
+    for product in products:
+        row = summary.get(product.pk, {})
+        product.total_stock = row.get('total_stock', 0)
+        product.variant_count = row.get('variant_count', 0)
+    return products
+
+
 @login_required(login_url='admin_panel:login')
 def product_create(request):
     if not request.user.is_staff:
@@ -405,6 +378,120 @@ def variant_delete(request, variant_id):
     return render(request, 'admin_panel/products/variant_delete.html', context)
 
 
+# ==================== INVENTORY ====================
+
+ADMIN_INVENTORY_PER_PAGE = 50
+# Upload errors beyond this many are summarised rather than listed
+MAX_UPLOAD_ERRORS_SHOWN = 20
+
+
+@login_required(login_url='admin_panel:login')
+def inventory_edit(request):
+    if not request.user.is_staff:
+        return redirect('core:home')
+
+    variants = ProductVariant.objects.select_related('product').order_by('product__name', 'product_id', 'color', 'size')
+    search_query = request.GET.get('search', '')
+    category_filter = request.GET.get('category', '')
+
+    if search_query:
+        variants = variants.filter(product__name__icontains=search_query)
+
+    if category_filter:
+        variants = variants.filter(product__category_id=category_filter)
+
+    page = Paginator(variants, ADMIN_INVENTORY_PER_PAGE).get_page(request.GET.get('page'))
+    row_errors = {}
+    changes = []
+
+    if request.method == 'POST':
+        # Only the fields the admin edited, checked against the values the grid was loaded
+        # with, so the stale stock of untouched rows never undoes an order placed meanwhile
+        for variant_id in request.POST.getlist('variant'):
+            change = {'key': variant_id, 'variant_id': variant_id, 'expected': {}}
+            for field_name in INVENTORY_FIELDS:
+                value = request.POST.get(f'{field_name}-{variant_id}', '')
+                original = request.POST.get(f'{field_name}-orig-{variant_id}', '')
+                if value != original:
+                    change[field_name] = value
+                    change['expected'][field_name] = original
+            if change['expected']:
+                changes.append(change)
+        try:
+            updated = update_inventory(changes)
+        except InventoryUpdateError as e:
+            for key, message in e.errors:
+                row_errors.setdefault(key, []).append(message)
+            messages.error(request, 'Nothing was saved. Please correct the highlighted rows.')
+        else:
+            messages.success(request, f'{updated} variant(s) updated.')
+            return redirect(request.get_full_path())
+
+    # Keep the admin's edits if the save was rejected; everything else, and the originals the
+    # next save is checked against, comes from the stored values
+    edited = {change['key']: change for change in changes}
+    for variant in page.object_list:
+        key = str(variant.id)
+        variant.stock_orig = variant.stock
+        variant.price_override_orig = variant.price_override if variant.price_override is not None else ''
+        variant.stock_value = edited.get(key, {}).get('stock', variant.stock_orig)
+        variant.price_override_value = edited.get(key, {}).get('price_override', variant.price_override_orig)
+        variant.errors = row_errors.pop(key, [])
+    # Rows no longer on this page, e.g. a variant deleted while the grid was open
+    for row_messages in row_errors.values():
+        for message in row_messages:
+            messages.error(request, message)
+
+    query_params = request.GET.copy()
+    query_params.pop('page', None)
+
+    context = {
+        'variants': page,
+        'page': page,
+        'query_params': query_params.urlencode(),
+        'categories': Category.objects.all(),
+        'search_query': search_query,
+        'category_filter': category_filter,
+        'upload_form': InventoryUploadForm(),
+        'section': 'products',
+    }
+    return render(request, 'admin_panel/products/inventory.html', context)
+
+
+@login_required(login_url='admin_panel:login')
+def inventory_upload(request):
+    if not request.user.is_staff:
+        return redirect('core:home')
+
+    if request.method == 'POST':
+        form = InventoryUploadForm(request.POST, request.FILES)
+        if form.is_valid():
+            try:
+                updated = update_inventory(parse_inventory_csv(form.cleaned_data['csv_file']))
+            except InventoryUpdateError as e:
+                messages.error(request, 'Nothing was saved from the upload.')
+                for key, message in e.errors[:MAX_UPLOAD_ERRORS_SHOWN]:
+                    messages.error(request, f'Line {key}: {message}' if key else message)
+                if len(e.errors) > MAX_UPLOAD_ERRORS_SHOWN:
+                    messages.error(request, f'...and {len(e.errors) - MAX_UPLOAD_ERRORS_SHOWN} more errors.')
+            else:
+                messages.success(request, f'{updated} variant(s) updated from the upload.')
+        else:
+            messages.error(request, 'Please choose a CSV file to upload.')
+
+    return redirect('admin_panel:inventory_edit')
+
+
+@login_required(login_url='admin_panel:login')
+def inventory_download(request):
+    if not request.user.is_staff:
+        return redirect('core:home')
+
+    response = StreamingHttpResponse(stream_csv(VARIANT_FIELDS, inventory_rows()), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="inventory-{timezone.localdate()}.csv"'
+    return response
+
+
 # ==================== PRODUCT IMAGES ====================
 
 @login_required(login_url='admin_panel:login')
@@ -460,12 +547,13 @@ def image_set_primary(request, image_id):
 
     image = get_object_or_404(ProductImage, id=image_id)
 
-    # Unset all primary images for this product
-    ProductImage.objects.filter(product=image.product).update(is_primary=False)
+    with transaction.atomic():
+        # Unset all primary images for this product
+        ProductImage.objects.filter(product_id=image.product_id).update(is_primary=False)
 
-    # Set this image as primary
-    image.is_primary = True
-    image.save()
+        # Set this image as primary; post_save refreshes Product.primary_image
+        image.is_primary = True
+        image.save()
 
     messages.success(request, f'Primary image updated.')
     return redirect('admin_panel:product_edit', product_id=image.product.id)
@@ -473,12 +561,18 @@ def image_set_primary(request, image_id):
 
 # ==================== ORDERS ====================
 
+ADMIN_ORDERS_PER_PAGE = 50
+
+
 @login_required(login_url='admin_panel:login')
 def order_list(request):
     if not request.user.is_staff:
         return redirect('core:home')
 
-    orders = Order.objects.select_related('user').prefetch_related('items__variant').all().order_by('-created_at')
+    # Only the columns the list shows; items are not needed here
+    orders = Order.objects.select_related('user').only(
+        'id', 'order_number', 'email', 'total_price', 'status', 'created_at', 'user__username'
+    ).order_by('-created_at', '-id')
     search_query = request.GET.get('search', '')
     status_filter = request.GET.get('status', '')
 
@@ -492,8 +586,25 @@ def order_list(request):
     if status_filter:
         orders = orders.filter(status=status_filter)
 
+    # No COUNT(*) over the order history: one row past the page tells whether there is a next
+    # one, and the daily rollups give an estimated total (they may drift, so never page by it)
+    try:
+        page_number = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page_number = 1
+    offset = (page_number - 1) * ADMIN_ORDERS_PER_PAGE
+    page_orders = list(orders[offset:offset + ADMIN_ORDERS_PER_PAGE + 1])
+
+    query_params = request.GET.copy()
+    query_params.pop('page', None)
+
     context = {
-        'orders': orders,
+        'orders': page_orders[:ADMIN_ORDERS_PER_PAGE],
+        'page_number': page_number,
+        'has_previous': page_number > 1,
+        'has_next': len(page_orders) > ADMIN_ORDERS_PER_PAGE,
+        'estimated_count': None if search_query else count_orders(status_filter),
+        'query_params': query_params.urlencode(),
         'search_query': search_query,
         'status_filter': status_filter,
         'status_choices': Order.STATUS_CHOICES,
@@ -502,6 +613,45 @@ def order_list(request):
     return render(request, 'admin_panel/orders/list.html', context)
 
 
+@login_required(login_url='admin_panel:login')
+def order_export(request):
+    if not request.user.is_staff:
+        return redirect('core:home')
+
+    if request.GET:
+        form = OrderExportForm(request.GET)
+    else:
+        today = timezone.localdate()
+        form = OrderExportForm(initial={
+            'start_date': today.replace(day=1),
+            'end_date': today,
+            'export': 'orders',
+            'file_format': 'csv',
+        })
+
+    if form.is_bound and form.is_valid():
+        data = form.cleaned_data
+        orders = get_export_orders(data['start_date'], data['end_date'], data['status'])
+        if data['export'] == 'lines':
+            fields, rows = LINE_FIELDS, line_rows(orders)
+        else:
+            fields, rows = ORDER_FIELDS, order_rows(orders)
+
+        if data['file_format'] == 'jsonl':
+            response = StreamingHttpResponse(stream_jsonl(rows), content_type='application/x-ndjson')
+        else:
+            response = StreamingHttpResponse(stream_csv(fields, rows), content_type='text/csv')
+        filename = f"{data['export']}-{data['start_date']}-to-{data['end_date']}.{data['file_format']}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    context = {
+        'form': form,
+        'section': 'orders',
+    }
+    return render(request, 'admin_panel/orders/export.html', context)
+
+
 @login_required(login_url='admin_panel:login')
 def order_detail(request, order_id):
     if not request.user.is_staff:
@@ -513,8 +663,12 @@ def order_detail(request, order_id):
     if request.method == 'POST':
         form = OrderStatusForm(request.POST)
         if form.is_valid():
-            order.status = form.cleaned_data['status']
-            order.save()
+            with transaction.atomic():
+                # Re-read under a row lock so a double submit can't move the rollups twice
+                order = Order.objects.select_for_update().get(pk=order.pk)
+                old_status, order.status = order.status, form.cleaned_data['status']
+                order.save()
+                record_status_change(order, old_status)
             messages.success(request, f'Order status updated to "{order.get_status_display()}".')
             return redirect('admin_panel:order_detail', order_id=order.id)
     else:
@@ -539,8 +693,12 @@ def order_update_status(request, order_id):
     if request.method == 'POST':
         new_status = request.POST.get('status')
         if new_status in dict(Order.STATUS_CHOICES).keys():
-            order.status = new_status
-            order.save()
+            with transaction.atomic():
+                # Re-read under a row lock so a double submit can't move the rollups twice
+                order = Order.objects.select_for_update().get(pk=order.pk)
+                old_status, order.status = order.status, new_status
+                order.save()
+                record_status_change(order, old_status)
             messages.success(request, f'Order status updated to "{order.get_status_display()}".')
         else:
             messages.error(request, 'Invalid status.')
@@ -550,13 +708,25 @@ def order_update_status(request, order_id):
 
 # ==================== CUSTOMERS ====================
 
+ADMIN_CUSTOMERS_PER_PAGE = 25
+
+# Stat orderings sort on the grouped annotations; ties fall back to the newest profile
+ADMIN_CUSTOMER_SORT_ORDERINGS = {
+    'newest': ('-created_at', '-id'),
+    'spend': ('-lifetime_spend', '-id'),
+    'orders': ('-order_count', '-id'),
+    'recent': (F('last_order_at').desc(nulls_last=True), '-id'),
+}
+
+
 @login_required(login_url='admin_panel:login')
 def customer_list(request):
     if not request.user.is_staff:
         return redirect('core:home')
 
-    customers = UserProfile.objects.select_related('user').all().order_by('-created_at')
+    customers = UserProfile.objects.select_related('user')
     search_query = request.GET.get('search', '')
+    sort_by = request.GET.get('sort', 'newest')
 
     if search_query:
         customers = customers.filter(
@@ -566,9 +736,26 @@ def customer_list(request):
             Q(city__icontains=search_query)
         )
 
+    if sort_by not in ADMIN_CUSTOMER_SORT_ORDERINGS:
+        sort_by = 'newest'
+    paginator = Paginator(
+        customers.with_order_stats().order_by(*ADMIN_CUSTOMER_SORT_ORDERINGS[sort_by]),
+        ADMIN_CUSTOMERS_PER_PAGE,
+    )
+    # Count the matching profiles alone rather than the grouped join on orders
+    paginator.count = customers.count()
+    page = paginator.get_page(request.GET.get('page'))
+
+    query_params = request.GET.copy()
+    query_params.pop('page', None)
+    query_params.pop('sort', None)
+
     context = {
-        'customers': customers,
+        'customers': page,
+        'page': page,
+        'query_params': query_params.urlencode(),
         'search_query': search_query,
+        'sort_by': sort_by,
         'section': 'customers',
     }
     return render(request, 'admin_panel/customers/list.html', context)
@@ -579,8 +766,8 @@ def customer_detail(request, customer_id):
     if not request.user.is_staff:
         return redirect('core:home')
 
-    profile = get_object_or_404(UserProfile, id=customer_id)
-    orders = Order.objects.filter(user=profile.user).order_by('-created_at')[:10]
+    profile = get_object_or_404(UserProfile.objects.select_related('user').with_order_stats(), id=customer_id)
+    orders = Order.objects.filter(user_id=profile.user_id).order_by('-created_at')[:10]
 
     context = {
         'profile': profile,
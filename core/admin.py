@@ -1,6 +1,9 @@
 from django.contrib import admin
+from django.db import transaction
+from django.utils import timezone
 from django.utils.html import format_html
-from .models import Category, Product, ProductImage, ProductVariant, Cart, CartItem, Order, OrderItem
+from .models import Category, Product, ProductImage, ProductVariant, Cart, CartItem, Order, OrderItem, EmailOutbox
+from .rollups import record_status_change, update_order_statuses
 
 
 class ProductImageInline(admin.TabularInline):
@@ -32,9 +35,9 @@ class ProductAdmin(admin.ModelAdmin):
     inlines = [ProductImageInline, ProductVariantInline]
 
     def thumbnail_preview(self, obj):
-        if obj.images.first():
+        if obj.get_first_image():
             return format_html('<img src="{}" width="50" height="50" style="object-fit:cover;"/>',
-                             obj.images.first().image.url)
+                             obj.get_first_image().url)
         return "No Image"
     thumbnail_preview.short_description = 'Image'
 
@@ -65,7 +68,7 @@ class CartAdmin(admin.ModelAdmin):
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     extra = 0
-    readonly_fields = ['variant', 'price', 'quantity', 'get_total_price']
+    readonly_fields = ['variant', 'product', 'price', 'quantity', 'get_total_price']
     can_delete = False
 
 
@@ -91,18 +94,40 @@ class OrderAdmin(admin.ModelAdmin):
 
     actions = ['mark_as_paid', 'mark_as_processing', 'mark_as_shipped', 'mark_as_delivered']
 
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            # The stored status under a row lock, not the form's initial value, which may be stale
+            old_status = Order.objects.select_for_update().values_list('status', flat=True).get(pk=obj.pk) if change else None
+            super().save_model(request, obj, form, change)
+            if change:
+                record_status_change(obj, old_status)
+
     def mark_as_paid(self, request, queryset):
-        queryset.update(status='paid')
+        update_order_statuses(queryset, 'paid')
     mark_as_paid.short_description = 'Mark selected orders as paid'
 
     def mark_as_processing(self, request, queryset):
-        queryset.update(status='processing')
+        update_order_statuses(queryset, 'processing')
     mark_as_processing.short_description = 'Mark selected orders as processing'
 
     def mark_as_shipped(self, request, queryset):
-        queryset.update(status='shipped')
+        update_order_statuses(queryset, 'shipped')
     mark_as_shipped.short_description = 'Mark selected orders as shipped'
 
     def mark_as_delivered(self, request, queryset):
-        queryset.update(status='delivered')
+        update_order_statuses(queryset, 'delivered')
     mark_as_delivered.short_description = 'Mark selected orders as delivered'
+
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'recipient', 'status', 'attempts', 'created_at', 'sent_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['recipient', 'subject']
+    readonly_fields = ['recipient', 'subject', 'body', 'html_body', 'attempts', 'last_error',
+                       'created_at', 'updated_at', 'sent_at']
+    actions = ['requeue']
+
+    def requeue(self, request, queryset):
+        queryset.exclude(status='sent').update(status='pending', attempts=0, available_at=timezone.now())
+    requeue.short_description = 'Requeue selected emails'
@@ -1,8 +1,82 @@
 """
 Utility functions for handling both session-based (anonymous) and database (authenticated) carts
 """
-from .models import Cart, CartItem, ProductVariant
+from decimal import Decimal
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import DecimalField, F, Sum
+from django.db.models.functions import Coalesce
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from .models import Cart, CartItem, ProductVariant
+
+# Summaries are written through on every cart change; the timeout only bounds
+# staleness from changes made elsewhere (price edits, deleted variants)
+CART_SUMMARY_CACHE_TIMEOUT = 60 * 15
+
+
+def get_cart_summary_cache_key(user_id):
+    return f'cart:{user_id}:summary'
+
+
+def clear_user_cart(user):
+    """Empty a user's database cart outside a request, e.g. from a background worker"""
+    CartItem.objects.filter(cart__user=user).delete()
+    cache.set(
+        get_cart_summary_cache_key(user.pk),
+        {'total_items': 0, 'total_price': 0},
+        CART_SUMMARY_CACHE_TIMEOUT,
+    )
+
+
+class CartLine:
+    """
+    A single cart line resolved to its variant, with the same shape for
+    database carts and session carts
+    """
+
+    def __init__(self, variant, quantity):
+        self.variant = variant
+        self.quantity = quantity
+        self.total_price = variant.get_price() * quantity
+
+    def get_total_price(self):
+        return self.total_price
+
+
+class CartSnapshot:
+    """
+    The cart as loaded once for the current request: every line with its
+    variant and product, plus totals computed in memory
+    """
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.total_items = sum(line.quantity for line in lines)
+        self.total_price = sum((line.total_price for line in lines), 0)
+
+    def __iter__(self):
+        return iter(self.lines)
+
+    def __len__(self):
+        return len(self.lines)
+
+    def get_summary(self):
+        return {'total_items': self.total_items, 'total_price': self.total_price}
+
+    @classmethod
+    def for_user(cls, user):
+        items = CartItem.objects.filter(cart__user=user).select_related('variant__product')
+        return cls([CartLine(item.variant, item.quantity) for item in items])
+
+    @classmethod
+    def for_session(cls, session_cart, variants):
+        """Build lines from a session cart and its pre-fetched {variant_id: variant} map"""
+        return cls([
+            CartLine(variants[int(variant_id)], item_data['quantity'])
+            for variant_id, item_data in session_cart.items()
+            if int(variant_id) in variants
+        ])
 
 
 class CartHandler:
@@ -15,11 +89,9 @@ class CartHandler:
         self.session = request.session
         self.user = request.user
 
-        # Initialize session cart if it doesn't exist
-        cart = self.session.get('cart')
-        if not cart:
-            cart = self.session['cart'] = {}
-        self.cart = cart
+        # The session cart is only written back by save(), so read-only
+        # requests never mark the session as modified
+        self.cart = self.session.get('cart') or {}
 
     def add(self, variant_id, quantity=1, override=False):
         """
@@ -52,9 +124,11 @@ class CartHandler:
             if cart_item.quantity > variant.stock:
                 cart_item.quantity = variant.stock
                 cart_item.save()
+                self.cart_changed()
                 return False, f'Maximum stock reached. Only {variant.stock} items available.'
 
             cart_item.save()
+            self.cart_changed()
             return True, 'Item added to cart successfully.'
         else:
             # Session cart for anonymous users
@@ -87,6 +161,7 @@ class CartHandler:
                 cart = Cart.objects.get(user=self.user)
                 cart_item = CartItem.objects.get(cart=cart, variant_id=variant_id)
                 cart_item.delete()
+                self.cart_changed()
                 return True, 'Item removed from cart.'
             except (Cart.DoesNotExist, CartItem.DoesNotExist):
                 return False, 'Item not found in cart.'
@@ -116,6 +191,7 @@ class CartHandler:
                 cart_item = CartItem.objects.get(cart=cart, variant_id=variant_id)
                 cart_item.quantity = quantity
                 cart_item.save()
+                self.cart_changed()
                 return True, 'Cart updated successfully.'
             except (Cart.DoesNotExist, CartItem.DoesNotExist):
                 return False, 'Item not found in cart.'
@@ -134,98 +210,166 @@ class CartHandler:
                 cart.items.all().delete()
             except Cart.DoesNotExist:
                 pass
+            self.cart_changed()
         else:
-            self.session['cart'] = {}
+            self.cart = {}
+            self.save()
+
+    def get_snapshot(self):
+        """
+        Load the cart once per request; every CartHandler built for the same
+        request shares the result until the cart is modified
+        """
+        snapshot = getattr(self.request, '_cart_snapshot', None)
+        if snapshot is None:
+            if self.user.is_authenticated:
+                snapshot = CartSnapshot.for_user(self.user)
+                # A full load is authoritative, so heal a stale badge summary (no write when it is current)
+                summary = snapshot.get_summary()
+                if cache.get(self.summary_cache_key) != summary:
+                    cache.set(self.summary_cache_key, summary, CART_SUMMARY_CACHE_TIMEOUT)
+            else:
+                snapshot = CartSnapshot.for_session(self.cart, self.get_session_variants())
+            self.request._cart_snapshot = snapshot
+        return snapshot
+
+    def get_session_variants(self):
+        """
+        Fetch every variant in the session cart with one query, and prune
+        lines whose variant has been deleted in the same pass
+        """
+        variant_ids = {variant_id: int(variant_id) for variant_id in self.cart if variant_id.isdigit()}
+        variants = ProductVariant.objects.select_related('product').in_bulk(variant_ids.values())
+
+        stale_ids = [variant_id for variant_id in self.cart if variant_ids.get(variant_id) not in variants]
+        if stale_ids:
+            for variant_id in stale_ids:
+                del self.cart[variant_id]
             self.save()
 
+        return variants
+
     def get_items(self):
         """Get all cart items with product details"""
-        if self.user.is_authenticated:
-            try:
-                cart = Cart.objects.get(user=self.user)
-                return cart.items.select_related('variant__product').all()
-            except Cart.DoesNotExist:
-                return []
-        else:
-            # Build cart items from session
-            items = []
-            for variant_id, item_data in self.cart.items():
-                try:
-                    variant = ProductVariant.objects.select_related('product').get(id=variant_id)
-                    items.append({
-                        'variant': variant,
-                        'quantity': item_data['quantity'],
-                        'total_price': variant.get_price() * item_data['quantity']
-                    })
-                except ProductVariant.DoesNotExist:
-                    continue
-            return items
+        return self.get_snapshot().lines
 
     def get_total_price(self):
         """Calculate total price of cart"""
-        if self.user.is_authenticated:
-            try:
-                cart = Cart.objects.get(user=self.user)
-                return cart.get_total_price()
-            except Cart.DoesNotExist:
-                return 0
-        else:
-            total = 0
-            for variant_id, item_data in self.cart.items():
-                try:
-                    variant = ProductVariant.objects.get(id=variant_id)
-                    total += variant.get_price() * item_data['quantity']
-                except ProductVariant.DoesNotExist:
-                    continue
-            return total
+        return self.get_snapshot().total_price
 
     def get_total_items(self):
         """Get total number of items in cart"""
+        return self.get_snapshot().total_items
+
+    @property
+    def summary_cache_key(self):
+        return get_cart_summary_cache_key(self.user.pk)
+
+    def get_summary(self):
+        """
+        Item count and total for the navbar badge. Reuses the request's
+        snapshot if one is loaded, otherwise reads the cached summary for
+        authenticated users and the session lines for anonymous ones, so the
+        cart tables are not queried on ordinary page views.
+        """
+        snapshot = getattr(self.request, '_cart_snapshot', None)
+        if snapshot is not None:
+            return snapshot.get_summary()
+
         if self.user.is_authenticated:
-            try:
-                cart = Cart.objects.get(user=self.user)
-                return cart.get_total_items()
-            except Cart.DoesNotExist:
-                return 0
-        else:
-            return sum(item['quantity'] for item in self.cart.values())
+            summary = cache.get(self.summary_cache_key)
+            if summary is None:
+                summary = self.refresh_summary()
+            return summary
+
+        return {
+            'total_items': sum(item['quantity'] for item in self.cart.values()),
+            'total_price': sum((Decimal(item['price']) * item['quantity'] for item in self.cart.values()), 0),
+        }
+
+    def refresh_summary(self):
+        """Recompute the authenticated user's cart summary with one aggregate and cache it"""
+        totals = CartItem.objects.filter(cart__user=self.user).aggregate(
+            total_items=Sum('quantity'),
+            total_price=Sum(
+                F('quantity') * Coalesce('variant__price_override', 'variant__product__price'),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            ),
+        )
+        summary = {
+            'total_items': totals['total_items'] or 0,
+            'total_price': totals['total_price'] or 0,
+        }
+        cache.set(self.summary_cache_key, summary, CART_SUMMARY_CACHE_TIMEOUT)
+        return summary
+
+    def cart_changed(self):
+        """Called after every database cart change: drop the snapshot, write the summary through"""
+        self.invalidate_snapshot()
+        self.refresh_summary()
+
+    def invalidate_snapshot(self):
+        """Forget the request's snapshot after the cart has changed"""
+        self.request._cart_snapshot = None
 
     def save(self):
-        """Mark session as modified"""
+        """Write the session cart back and mark the session as modified"""
+        self.session['cart'] = self.cart
         self.session.modified = True
+        self.invalidate_snapshot()
 
     def merge_session_cart_to_user(self):
         """
         Merge anonymous session cart into user's database cart
-        Called after user logs in
+        Called after user logs in. Runs in one transaction with a fixed number
+        of queries: one variant fetch, one locked existing-items fetch, then a
+        bulk insert and a bulk update, with stock clamping done in memory.
         """
         if not self.user.is_authenticated or not self.cart:
             return
 
-        cart, created = Cart.objects.get_or_create(user=self.user)
+        with transaction.atomic():
+            cart, created = Cart.objects.get_or_create(user=self.user)
+            variants = self.get_session_variants()
+            while True:
+                existing_items = {
+                    item.variant_id: item
+                    for item in CartItem.objects.select_for_update().filter(cart=cart, variant_id__in=variants.keys())
+                }
 
-        for variant_id, item_data in self.cart.items():
-            try:
-                variant = ProductVariant.objects.get(id=variant_id)
-                cart_item, created = CartItem.objects.get_or_create(
-                    cart=cart,
-                    variant=variant
-                )
-
-                if not created:
-                    # Add session quantity to existing quantity
-                    cart_item.quantity += item_data['quantity']
-                else:
-                    cart_item.quantity = item_data['quantity']
+                items_to_update = []
+                items_to_create = []
+                for variant_id, item_data in self.cart.items():
+                    variant = variants[int(variant_id)]
+                    cart_item = existing_items.get(variant.id)
 
-                # Ensure we don't exceed stock
-                if cart_item.quantity > variant.stock:
-                    cart_item.quantity = variant.stock
+                    if cart_item is not None:
+                        # Add session quantity to existing quantity
+                        cart_item.quantity += item_data['quantity']
+                        items_to_update.append(cart_item)
+                    else:
+                        cart_item = CartItem(cart=cart, variant=variant, quantity=item_data['quantity'])
+                        items_to_create.append(cart_item)
 
-                cart_item.save()
-            except ProductVariant.DoesNotExist:
-                continue
+                    # Ensure we don't exceed stock
+                    if cart_item.quantity > variant.stock:
+                        cart_item.quantity = variant.stock
+
+                try:
+                    with transaction.atomic():
+                        CartItem.objects.bulk_create(items_to_create)
+                except IntegrityError:
+                    # A concurrent request added one of these variants first. Nothing
+                    # was written yet, so merge again with its row read and locked.
+                    continue
+                break
+
+            now = timezone.now()
+            for cart_item in items_to_update:
+                cart_item.updated_at = now
+            CartItem.objects.bulk_update(items_to_update, ['quantity', 'updated_at'])
 
         # Clear session cart after merging
-        self.session['cart'] = {}
+        self.cart = {}
         self.save()
+        self.refresh_summary()
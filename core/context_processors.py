@@ -1,15 +1,28 @@
 """
 Context processors for making data available across all templates
 """
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
 from .cart_utils import CartHandler
 
 
 def cart_context(request):
     """
     Add cart information to all template contexts
+
+    Values are lazy: the cart is only loaded if a template actually uses them,
+    and views in CART_CONTEXT_EXCLUDED_NAMESPACES get no cart context at all.
     """
-    cart_handler = CartHandler(request)
+    resolver_match = getattr(request, 'resolver_match', None)
+    excluded = getattr(settings, 'CART_CONTEXT_EXCLUDED_NAMESPACES', ())
+    if resolver_match and any(namespace in excluded for namespace in resolver_match.namespaces):
+        return {}
+
+    def get_summary():
+        # Cached badge summary; reuses the view's snapshot if it already loaded the cart
+        return CartHandler(request).get_summary()
+
     return {
-        'cart_total_items': cart_handler.get_total_items(),
-        'cart_total_price': cart_handler.get_total_price(),
+        'cart_total_items': SimpleLazyObject(lambda: get_summary()['total_items']),
+        'cart_total_price': SimpleLazyObject(lambda: get_summary()['total_price']),
     }
@@ -1,21 +1,60 @@
 """
 Email utility functions for sending order and payment notifications
+
+Emails are not sent inline: each function renders its message and queues it
+in the EmailOutbox, so it commits or rolls back with the surrounding
+transaction. The send_outbox_emails command delivers the queue.
 """
-from django.core.mail import send_mail
+from django.db.models import Prefetch, prefetch_related_objects
 from django.template.loader import render_to_string
-from django.conf import settings
+from .models import EmailOutbox, OrderItem
+
+
+def enqueue_email(recipient, subject, body, html_body=''):
+    """Queue one email for the outbox worker; a single INSERT"""
+    return EmailOutbox.objects.create(recipient=recipient, subject=subject, body=body, html_body=html_body)
+
+
+def get_order_items(order):
+    """
+    The order's items with variant and product, loaded in one query the first
+    time and cached on the order, so every email built from the same order
+    instance (HTML and text parts alike) shares that single fetch
+    """
+    prefetch_related_objects(
+        [order], Prefetch('items', queryset=OrderItem.objects.select_related('variant__product'))
+    )
+    return list(order.items.all())
+
+
+def format_order_items(order_items):
+    lines = []
+    for item in order_items:
+        if item.variant:
+            name = f"{item.variant.product.name} ({item.variant.get_color_display()} - {item.variant.get_size_display()})"
+        else:
+            name = 'Deleted Product'
+        lines.append(f"\n- {name} x{item.quantity} = GH₵{item.get_total_price()}")
+    return ''.join(lines)
+
+
+def send_checkout_emails(order, payment):
+    """Queue the order and payment confirmations from one load of the order's items"""
+    get_order_items(order)
+    return send_order_confirmation_email(order), send_payment_confirmation_email(order, payment)
 
 
 def send_order_confirmation_email(order):
     """
-    Send order confirmation email to customer after order is placed
+    Queue order confirmation email to customer after order is placed
     """
     subject = f'Order Confirmation - {order.order_number}'
+    order_items = get_order_items(order)
 
     # Render HTML email
     html_message = render_to_string('emails/order_confirmation.html', {
         'order': order,
-        'order_items': order.items.all(),
+        'order_items': order_items,
     })
 
     # Plain text version
@@ -29,8 +68,7 @@ Order Total: GH₵{order.total_price}
 
 Order Details:
 """
-    for item in order.items.all():
-        plain_message += f"\n- {item.variant.product.name} ({item.variant.get_color_display()} - {item.variant.get_size_display()}) x{item.quantity} = GH₵{item.get_total_price()}"
+    plain_message += format_order_items(order_items)
 
     plain_message += f"""
 
@@ -48,32 +86,21 @@ Best regards,
 MB Vogue Team
 """
 
-    try:
-        send_mail(
-            subject=subject,
-            message=plain_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[order.email],
-            html_message=html_message,
-            fail_silently=False,
-        )
-        return True
-    except Exception as e:
-        print(f"Error sending order confirmation email: {e}")
-        return False
+    return enqueue_email(order.email, subject, plain_message, html_message)
 
 
 def send_payment_confirmation_email(order, payment):
     """
-    Send payment confirmation email after successful payment
+    Queue payment confirmation email after successful payment
     """
     subject = f'Payment Confirmed - Order {order.order_number}'
+    order_items = get_order_items(order)
 
     # Render HTML email
     html_message = render_to_string('emails/payment_confirmation.html', {
         'order': order,
         'payment': payment,
-        'order_items': order.items.all(),
+        'order_items': order_items,
     })
 
     # Plain text version
@@ -89,8 +116,7 @@ Payment Status: {payment.get_status_display()}
 
 Order Details:
 """
-    for item in order.items.all():
-        plain_message += f"\n- {item.variant.product.name} ({item.variant.get_color_display()} - {item.variant.get_size_display()}) x{item.quantity} = GH₵{item.get_total_price()}"
+    plain_message += format_order_items(order_items)
 
     plain_message += f"""
 
@@ -110,24 +136,12 @@ Best regards,
 MB Vogue Team
 """
 
-    try:
-        send_mail(
-            subject=subject,
-            message=plain_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[order.email],
-            html_message=html_message,
-            fail_silently=False,
-        )
-        return True
-    except Exception as e:
-        print(f"Error sending payment confirmation email: {e}")
-        return False
+    return enqueue_email(order.email, subject, plain_message, html_message)
 
 
 def send_order_status_update_email(order, old_status, new_status):
     """
-    Send email when order status changes (e.g., shipped, delivered)
+    Queue email when order status changes (e.g., shipped, delivered)
     """
     subject = f'Order Status Update - {order.order_number}'
 
@@ -156,15 +170,4 @@ Best regards,
 MB Vogue Team
 """
 
-    try:
-        send_mail(
-            subject=subject,
-            message=plain_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[order.email],
-            fail_silently=False,
-        )
-        return True
-    except Exception as e:
-        print(f"Error sending order status update email: {e}")
-        return False
+    return enqueue_email(order.email, subject, plain_message)
@@ -0,0 +1,110 @@
+"""
+Time-ordered identifiers for order numbers and payment references.
+
+An identifier is 20 Crockford base32 characters:
+
+    TTTTTTTTTT HH PPPPP SSS
+    |          |  |     +-- 15-bit sequence within the millisecond
+    |          |  +-------- 25-bit process id
+    |          +----------- 10-bit host id
+    +---------------------- 50-bit millisecond timestamp
+
+Within one process the (timestamp, sequence) pair never repeats, and live
+processes on one host have distinct pids, so two identifiers can only
+collide if two servers share a host id. Set IDENTIFIER_HOST_ID to a distinct
+number (0-1023) per server to rule that out; otherwise each process draws a
+random host id. No database lookup is needed, and because the alphabet sorts
+in ASCII order, identifiers sort by creation time and new rows land at the
+end of the unique index.
+"""
+import os
+import secrets
+import threading
+import time
+
+from django.conf import settings
+
+CROCKFORD_ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+
+TIMESTAMP_CHARS = 10
+HOST_CHARS = 2
+PROCESS_CHARS = 5
+SEQUENCE_CHARS = 3
+
+MAX_HOST_ID = 32 ** HOST_CHARS - 1
+MAX_PROCESS_ID = 32 ** PROCESS_CHARS - 1
+MAX_SEQUENCE = 32 ** SEQUENCE_CHARS - 1
+
+
+def encode_base32(value, length):
+    chars = []
+    for _ in range(length):
+        value, remainder = divmod(value, 32)
+        chars.append(CROCKFORD_ALPHABET[remainder])
+    return ''.join(reversed(chars))
+
+
+class IdentifierGenerator:
+    """Thread-safe generator; one instance is shared per process"""
+
+    def __init__(self, host_id=None):
+        if host_id is not None and not 0 <= host_id <= MAX_HOST_ID:
+            raise ValueError(f'host_id must be between 0 and {MAX_HOST_ID}')
+        self.host_id = host_id
+        self.reset()
+
+    def reset(self):
+        """Start a fresh sequence for the current process; called again after fork"""
+        host_id = self.host_id if self.host_id is not None else secrets.randbelow(MAX_HOST_ID + 1)
+        self.node = encode_base32(host_id, HOST_CHARS) + encode_base32(os.getpid() & MAX_PROCESS_ID, PROCESS_CHARS)
+        self.lock = threading.Lock()
+        self.last_ms = 0
+        self.sequence = 0
+
+    def generate(self):
+        with self.lock:
+            now_ms = time.time_ns() // 1_000_000
+            if now_ms > self.last_ms:
+                self.last_ms = now_ms
+                self.sequence = 0
+            else:
+                # Same millisecond, or the clock stepped back: stay on last_ms
+                self.sequence += 1
+                if self.sequence > MAX_SEQUENCE:
+                    # Sequence exhausted; borrow the next millisecond
+                    self.last_ms += 1
+                    self.sequence = 0
+            timestamp, sequence = self.last_ms, self.sequence
+
+        return encode_base32(timestamp, TIMESTAMP_CHARS) + self.node + encode_base32(sequence, SEQUENCE_CHARS)
+
+
+_generator = None
+_generator_lock = threading.Lock()
+
+
+def get_identifier_generator():
+    global _generator
+    if _generator is None:
+        with _generator_lock:
+            if _generator is None:
+                host_id = getattr(settings, 'IDENTIFIER_HOST_ID', None)
+                _generator = IdentifierGenerator(int(host_id) if host_id not in (None, '') else None)
+    return _generator
+
+
+def new_identifier():
+    """Return a new unique, time-ordered identifier"""
+    return get_identifier_generator().generate()
+
+
+def _reset_after_fork():
+    # Forked workers (e.g. gunicorn) must not continue the parent's pid and sequence
+    global _generator_lock
+    _generator_lock = threading.Lock()
+    if _generator is not None:
+        _generator.reset()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
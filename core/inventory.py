@@ -0,0 +1,150 @@
+"""
+Bulk stock and price edits for many variants at once, from the admin
+inventory grid or an uploaded CSV.
+"""
+import csv
+import io
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+from .models import Product, ProductVariant
+
+INVENTORY_FIELDS = ['stock', 'price_override']
+# Rows per UPDATE statement issued by bulk_update
+INVENTORY_BATCH_SIZE = 500
+
+
+class InventoryUpdateError(Exception):
+    """
+    Raised when any change is invalid; nothing is saved. errors holds one
+    (key, message) pair per problem, key being the change's key (None for
+    problems with the file as a whole).
+    """
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__('; '.join(message for key, message in errors))
+
+
+def update_inventory(changes):
+    """
+    Apply stock and price_override changes to many variants at once.
+
+    changes is a list of dicts with a key (reported back with errors, e.g.
+    the CSV line), a variant_id and the raw values of any INVENTORY_FIELDS
+    to change; a blank price_override clears the override. A change may also
+    hold expected, the raw values its fields had when the admin loaded them;
+    if the locked row no longer matches (e.g. an order took stock meanwhile)
+    the change is reported instead of overwriting it. Everything is
+    validated in memory with the variant form's field rules before anything
+    is written, then the variants that actually changed are saved with one
+    bulk_update in a single transaction. Returns the number of variants
+    changed.
+    """
+    errors = []
+    parsed = {}
+    for change in changes:
+        key = change['key']
+        try:
+            variant_id = int(change['variant_id'])
+        except (TypeError, ValueError):
+            errors.append((key, f"'{change['variant_id']}' is not a variant id."))
+            continue
+        if variant_id in parsed:
+            errors.append((key, f'Variant {variant_id} appears more than once.'))
+            continue
+
+        values = {}
+        for field_name in INVENTORY_FIELDS:
+            if field_name not in change:
+                continue
+            try:
+                values[field_name] = _clean_value(field_name, change[field_name])
+            except ValidationError as e:
+                errors.append((key, f"{field_name}: {' '.join(e.messages)}"))
+        expected = {}
+        for field_name, raw in change.get('expected', {}).items():
+            try:
+                expected[field_name] = _clean_value(field_name, raw)
+            except ValidationError as e:
+                errors.append((key, f"{field_name}: {' '.join(e.messages)}"))
+        parsed[variant_id] = (key, values, expected)
+
+    with transaction.atomic():
+        variants = ProductVariant.objects.select_for_update().in_bulk(parsed.keys())
+        for variant_id, (key, values, expected) in parsed.items():
+            if variant_id not in variants:
+                errors.append((key, f'Variant {variant_id} does not exist.'))
+                continue
+            # Compare and swap: only overwrite the values the admin saw
+            for field_name, value in expected.items():
+                current = getattr(variants[variant_id], field_name)
+                if current != value:
+                    errors.append((key, f"{field_name}: changed to {'blank' if current is None else current} since the page was loaded."))
+        if errors:
+            raise InventoryUpdateError(errors)
+
+        now = timezone.now()
+        changed = []
+        changed_fields = set()
+        for variant_id, (key, values, expected) in parsed.items():
+            variant = variants[variant_id]
+            fields = [field_name for field_name, value in values.items() if getattr(variant, field_name) != value]
+            if not fields:
+                continue
+            for field_name in fields:
+                setattr(variant, field_name, values[field_name])
+            # bulk_update skips auto_now
+            variant.updated_at = now
+            changed.append(variant)
+            changed_fields.update(fields)
+
+        if changed:
+            # Only the columns that changed, e.g. just stock for a restock
+            ProductVariant.objects.bulk_update(
+                changed, sorted(changed_fields) + ['updated_at'], batch_size=INVENTORY_BATCH_SIZE
+            )
+        # bulk_update sends no post_save, so drop the cached variant matrices here
+        product_ids = {variant.product_id for variant in changed}
+        transaction.on_commit(lambda: _invalidate_variant_matrices(product_ids))
+
+    return len(changed)
+
+
+def parse_inventory_csv(file):
+    """
+    Read an uploaded CSV into changes for update_inventory. It needs a
+    variant_id column and a stock and/or price_override column; a blank
+    stock cell leaves the stock alone, a blank price_override clears it.
+    Each change is keyed by its line number.
+    """
+    try:
+        reader = csv.DictReader(io.TextIOWrapper(file, encoding='utf-8-sig', newline=''))
+        columns = [column for column in INVENTORY_FIELDS if column in (reader.fieldnames or [])]
+        if 'variant_id' not in (reader.fieldnames or []) or not columns:
+            raise InventoryUpdateError([(None, 'The CSV needs a variant_id column and a stock or price_override column.')])
+
+        changes = []
+        for row in reader:
+            change = {'key': reader.line_num, 'variant_id': (row['variant_id'] or '').strip()}
+            stock = (row.get('stock') or '').strip()
+            if stock:
+                change['stock'] = stock
+            if 'price_override' in columns:
+                change['price_override'] = (row['price_override'] or '').strip()
+            if change['variant_id'] or len(change) > 2:
+                changes.append(change)
+    except (UnicodeDecodeError, csv.Error):
+        raise InventoryUpdateError([(None, 'The file is not a UTF-8 encoded CSV.')])
+    return changes
+
+
+def _clean_value(field_name, raw):
+    # The form field carries the same rules as the single-variant edit form, e.g. stock >= 0
+    return ProductVariant._meta.get_field(field_name).formfield().clean(raw)
+
+
+def _invalidate_variant_matrices(product_ids):
+    cache.delete_many([Product(pk=product_id).variant_matrix_cache_key for product_id in product_ids])
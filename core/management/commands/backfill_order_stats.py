@@ -0,0 +1,71 @@
+"""
+Management command to rebuild the daily sales rollups from the order history
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from core.models import Order, OrderDailyStats, OrderItem, ProductDailySales
+
+
+class Command(BaseCommand):
+    help = 'Rebuild OrderDailyStats and ProductDailySales from Order and OrderItem, reading in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Orders read per query')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        order_totals = defaultdict(lambda: [0, Decimal('0')])
+        product_totals = defaultdict(lambda: [0, Decimal('0')])
+
+        last_id = 0
+        processed = 0
+        while True:
+            orders = list(
+                Order.objects.filter(pk__gt=last_id).order_by('pk')
+                .values_list('id', 'created_at', 'status', 'total_price')[:chunk_size]
+            )
+            if not orders:
+                break
+            last_id = orders[-1][0]
+
+            sale_dates = {}
+            for order_id, created_at, status, total_price in orders:
+                date = timezone.localdate(created_at)
+                totals = order_totals[(date, status)]
+                totals[0] += 1
+                totals[1] += total_price
+                if status in Order.REVENUE_STATUSES:
+                    sale_dates[order_id] = date
+
+            items = OrderItem.objects.filter(order_id__in=sale_dates, product__isnull=False).values_list(
+                'order_id', 'product_id', 'quantity', 'price'
+            )
+            for order_id, product_id, quantity, price in items:
+                totals = product_totals[(sale_dates[order_id], product_id)]
+                totals[0] += quantity
+                totals[1] += price * quantity
+
+            processed += len(orders)
+            self.stdout.write(f'Read {processed} orders')
+
+        # Swap the rollups in one transaction so the dashboard never sees a partial rebuild
+        with transaction.atomic():
+            OrderDailyStats.objects.all().delete()
+            ProductDailySales.objects.all().delete()
+            OrderDailyStats.objects.bulk_create([
+                OrderDailyStats(date=date, status=status, order_count=count, revenue=revenue)
+                for (date, status), (count, revenue) in order_totals.items()
+            ], batch_size=chunk_size)
+            ProductDailySales.objects.bulk_create([
+                ProductDailySales(date=date, product_id=product_id, quantity=quantity, revenue=revenue)
+                for (date, product_id), (quantity, revenue) in product_totals.items()
+            ], batch_size=chunk_size)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {len(order_totals)} daily order rows and {len(product_totals)} product sales rows '
+            f'from {processed} orders'
+        ))
@@ -0,0 +1,80 @@
+"""
+Management command to measure identifier throughput under concurrent creators
+"""
+import multiprocessing
+import random
+import string
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from core.identifiers import new_identifier
+from core.models import Order
+
+
+def generate_in_threads(threads, count):
+    """Generate count ids in each of threads threads sharing this process's generator"""
+    results = [None] * threads
+
+    def worker(index):
+        results[index] = [new_identifier() for _ in range(count)]
+
+    workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return results
+
+
+class Command(BaseCommand):
+    help = 'Benchmark order number / payment reference generation with many concurrent creators'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument('--threads', type=int, default=8, help='Threads per process')
+        parser.add_argument('--count', type=int, default=25000, help='Identifiers per thread')
+        parser.add_argument(
+            '--compare-legacy', type=int, default=0, metavar='N',
+            help='Also time N ids made the old way (random string + exists() query) against the database',
+        )
+
+    def handle(self, *args, **options):
+        processes, threads, count = options['processes'], options['threads'], options['count']
+        if processes > 1 and 'fork' not in multiprocessing.get_all_start_methods():
+            raise CommandError('Multiple processes need the fork start method; use --processes 1')
+
+        started = time.perf_counter()
+        if processes > 1:
+            with multiprocessing.get_context('fork').Pool(processes) as pool:
+                per_process = pool.starmap(generate_in_threads, [(threads, count)] * processes)
+        else:
+            per_process = [generate_in_threads(threads, count)]
+        elapsed = time.perf_counter() - started
+
+        sequences = [ids for process_ids in per_process for ids in process_ids]
+        total = sum(len(ids) for ids in sequences)
+        unique = len({identifier for ids in sequences for identifier in ids})
+        ordered = all(ids == sorted(ids) for ids in sequences)
+
+        self.stdout.write(
+            f'{processes} processes x {threads} threads: {total} ids in {elapsed:.2f}s '
+            f'({total / elapsed:,.0f} ids/s)'
+        )
+        self.stdout.write(f'Duplicates: {total - unique}; every creator saw increasing ids: {ordered}')
+        if unique != total or not ordered:
+            raise CommandError('Identifier generation is not collision-free and ordered')
+
+        legacy = options['compare_legacy']
+        if legacy:
+            started = time.perf_counter()
+            for _ in range(legacy):
+                order_number = ''.join(random.choices(string.ascii_uppercase + string.digits, k=10))
+                Order.objects.filter(order_number=order_number).exists()
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'Legacy random + exists(): {legacy} ids in {elapsed:.2f}s ({legacy / elapsed:,.0f} ids/s, '
+                f'one query each, still racy between check and insert)'
+            )
+
+        self.stdout.write(self.style.SUCCESS('Benchmark complete'))
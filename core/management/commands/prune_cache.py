@@ -0,0 +1,32 @@
+"""
+Management command that deletes expired entries from the database cache
+"""
+from django.core.cache import caches
+from django.core.cache.backends.db import DatabaseCache
+from django.core.management.base import BaseCommand
+from django.db import connections, router
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = 'Delete expired rows from the database cache table'
+
+    def handle(self, *args, **options):
+        cache = caches['default']
+        if not isinstance(cache, DatabaseCache):
+            self.stdout.write('The default cache is not a database cache; nothing to prune')
+            return
+
+        # The cache culls only past MAX_ENTRIES, so expired rows are otherwise never removed
+        db = router.db_for_write(cache.cache_model_class)
+        connection = connections[db]
+        table = connection.ops.quote_name(cache._table)
+        now = timezone.now().replace(microsecond=0)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {table} WHERE {connection.ops.quote_name("expires")} < %s',
+                [connection.ops.adapt_datetimefield_value(now)],
+            )
+            deleted = cursor.rowcount
+
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired cache entries'))
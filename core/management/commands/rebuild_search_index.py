@@ -0,0 +1,20 @@
+"""
+Management command to rebuild the product full-text search index
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from core.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the product full-text search index from the product table'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+
+        with transaction.atomic():
+            backend.rebuild()
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Search index rebuilt using {backend.__class__.__name__}')
+        )
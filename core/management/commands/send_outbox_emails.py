@@ -0,0 +1,30 @@
+"""
+Management command that delivers queued emails from the EmailOutbox
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from core.outbox import claim_batch, deliver_batch, requeue_stale
+
+
+class Command(BaseCommand):
+    help = 'Send queued emails in batches over one SMTP connection per batch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--once', action='store_true', help='Drain the outbox and exit instead of polling')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to sleep when the outbox is empty')
+
+    def handle(self, *args, **options):
+        while True:
+            requeue_stale()
+            emails = claim_batch(options['batch_size'])
+
+            if not emails:
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+                continue
+
+            sent = deliver_batch(emails)
+            self.stdout.write(f'Sent {sent} of {len(emails)} emails')
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:01
+
+from django.db import migrations, models
+
+
+def backfill_primary_image(apps, schema_editor):
+    Product = apps.get_model('core', 'Product')
+    ProductImage = apps.get_model('core', 'ProductImage')
+
+    for product_id in Product.objects.values_list('id', flat=True).iterator():
+        first_image = ProductImage.objects.filter(product_id=product_id).order_by(
+            '-is_primary', '-created_at'
+        ).values('image', 'alt_text').first()
+        if first_image:
+            Product.objects.filter(pk=product_id).update(
+                primary_image=first_image['image'],
+                primary_image_alt=first_image['alt_text'],
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_product_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='primary_image',
+            field=models.ImageField(blank=True, editable=False, upload_to='products/%Y/%m/%d/'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='primary_image_alt',
+            field=models.CharField(blank=True, editable=False, max_length=200),
+        ),
+        migrations.RunPython(backfill_primary_image, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, DecimalField, F, Sum
+from django.db.models.functions import TruncDate
+
+REVENUE_STATUSES = ['paid', 'processing', 'shipped', 'delivered']
+
+
+def backfill_rollups(apps, schema_editor):
+    Order = apps.get_model('core', 'Order')
+    OrderItem = apps.get_model('core', 'OrderItem')
+    OrderDailyStats = apps.get_model('core', 'OrderDailyStats')
+    ProductDailySales = apps.get_model('core', 'ProductDailySales')
+
+    OrderDailyStats.objects.bulk_create([
+        OrderDailyStats(**row)
+        for row in Order.objects.annotate(date=TruncDate('created_at')).values('date', 'status').annotate(
+            order_count=Count('id'), revenue=Sum('total_price'),
+        ).order_by()
+    ], batch_size=1000)
+
+    ProductDailySales.objects.bulk_create([
+        ProductDailySales(date=row['date'], product_id=row['variant__product_id'],
+                          quantity=row['units'], revenue=row['sales'])
+        for row in OrderItem.objects.filter(
+            order__status__in=REVENUE_STATUSES, variant__isnull=False
+        ).annotate(date=TruncDate('order__created_at')).values('date', 'variant__product_id').annotate(
+            units=Sum('quantity'),
+            sales=Sum(F('price') * F('quantity'), output_field=DecimalField(max_digits=14, decimal_places=2)),
+        ).order_by()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_emailoutbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('paid', 'Paid'), ('shipped', 'Shipped'), ('delivered', 'Delivered'), ('cancelled', 'Cancelled')], max_length=20)),
+                ('order_count', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'verbose_name_plural': 'Order daily stats',
+                'ordering': ['-date', 'status'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductDailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('quantity', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='core.product')),
+            ],
+            options={
+                'verbose_name_plural': 'Product daily sales',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='orderdailystats',
+            constraint=models.UniqueConstraint(fields=('date', 'status'), name='core_order_daily_stats_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='productdailysales',
+            constraint=models.UniqueConstraint(fields=('date', 'product'), name='core_product_daily_sales_unique'),
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
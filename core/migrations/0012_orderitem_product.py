@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import OuterRef, Subquery
+
+
+def copy_variant_products(apps, schema_editor):
+    # Lines whose variant is already gone were never counted in the rollups, so they can stay empty
+    OrderItem = apps.get_model('core', 'OrderItem')
+    ProductVariant = apps.get_model('core', 'ProductVariant')
+    OrderItem.objects.filter(variant__isnull=False).update(
+        product_id=Subquery(ProductVariant.objects.filter(pk=OuterRef('variant_id')).values('product_id')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_create_cache_table'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='product',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='order_items', to='core.product'),
+        ),
+        migrations.RunPython(copy_variant_products, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,12 @@
+from django.core.cache import cache
 from django.db import models
+from django.db.models import Count, ExpressionWrapper, Max, Min, Q, Sum
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.text import slugify
+from .identifiers import new_identifier
 
 
 class Category(models.Model):
@@ -28,6 +33,29 @@ class Category(models.Model):
         return reverse('core:product_list') + f'?category={self.slug}'
 
 
+# Variant matrices are invalidated on every change, so the timeout is only a safety net
+VARIANT_MATRIX_CACHE_TIMEOUT = 60 * 60
+
+
+class ProductQuerySet(models.QuerySet):
+    def with_card_data(self):
+        """
+        Annotate everything a product card or listing row needs in one query:
+        total_stock, variant_count, in_stock and min_price/max_price over the
+        effective variant prices (falling back to the product price).
+        The primary image is already stored on the row itself.
+        """
+        effective_price = Coalesce('variants__price_override', 'price')
+        return self.annotate(
+            total_stock=Coalesce(Sum('variants__stock'), 0, output_field=models.IntegerField()),
+            variant_count=Count('variants'),
+            min_price=Min(effective_price),
+            max_price=Max(effective_price),
+        ).annotate(
+            in_stock=ExpressionWrapper(Q(total_stock__gt=0), output_field=models.BooleanField()),
+        )
+
+
 class Product(models.Model):
     name = models.CharField(max_length=200)
     slug = models.SlugField(max_length=200, unique=True, blank=True)
@@ -36,11 +64,27 @@ class Product(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     featured = models.BooleanField(default=False)
     available = models.BooleanField(default=True)
+    # Denormalized copy of the primary ProductImage, kept in sync by refresh_primary_image()
+    primary_image = models.ImageField(upload_to='products/%Y/%m/%d/', blank=True, editable=False)
+    primary_image_alt = models.CharField(max_length=200, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ProductQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination orderings used by the storefront catalog
+            models.Index(fields=['available', '-created_at', '-id'], name='product_avail_newest_idx'),
+            models.Index(fields=['available', 'price', 'id'], name='product_avail_price_idx'),
+            models.Index(fields=['available', 'name', 'id'], name='product_avail_name_idx'),
+            # Sortable columns of the admin product list, which shows inactive products too
+            models.Index(fields=['-created_at', '-id'], name='product_newest_idx'),
+            models.Index(fields=['name', 'id'], name='product_name_idx'),
+            models.Index(fields=['price', 'id'], name='product_price_idx'),
+            models.Index(fields=['category', '-created_at', '-id'], name='product_cat_newest_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -54,14 +98,66 @@ class Product(models.Model):
         return reverse('core:product_detail', kwargs={'slug': self.slug})
 
     def get_first_image(self):
-        return self.images.first().image if self.images.first() else None
+        return self.primary_image if self.primary_image else None
+
+    def refresh_primary_image(self):
+        """Copy the current primary image onto the product row"""
+        first_image = self.images.order_by('-is_primary', '-created_at').values('image', 'alt_text').first()
+        self.primary_image = first_image['image'] if first_image else ''
+        self.primary_image_alt = first_image['alt_text'] if first_image else ''
+        # update() skips auto_now and the product save signals
+        Product.objects.filter(pk=self.pk).update(
+            primary_image=self.primary_image,
+            primary_image_alt=self.primary_image_alt,
+        )
 
     def get_price(self):
         return self.price
 
+    @property
+    def variant_matrix_cache_key(self):
+        return f'product:{self.pk}:variant_matrix'
+
+    def get_variant_matrix(self):
+        """
+        Return the in-stock variant matrix for the product page, built from a
+        single query and cached until a variant or the product itself changes:
+
+            {'colors': [[value, label], ...],
+             'sizes': [value, ...],
+             'variants': {color: {size: [variant_id, stock, effective_price]}}}
+        """
+        matrix = cache.get(self.variant_matrix_cache_key)
+        if matrix is None:
+            matrix = self._build_variant_matrix()
+            cache.set(self.variant_matrix_cache_key, matrix, VARIANT_MATRIX_CACHE_TIMEOUT)
+        return matrix
+
+    def _build_variant_matrix(self):
+        rows = self.variants.filter(stock__gt=0).values_list('id', 'color', 'size', 'stock', 'price_override')
+        color_labels = dict(ProductVariant.COLOR_CHOICES)
+        size_order = [size for size, label in ProductVariant.SIZE_CHOICES]
+
+        variants = {}
+        for variant_id, color, size, stock, price_override in rows:
+            price = price_override if price_override else self.price
+            variants.setdefault(color, {})[size] = [variant_id, stock, str(price)]
+
+        sizes = {size for sizes_for_color in variants.values() for size in sizes_for_color}
+        return {
+            'colors': [[color, color_labels.get(color, color)] for color in sorted(variants)],
+            'sizes': [size for size in size_order if size in sizes],
+            'variants': {
+                color: {size: sizes_for_color[size] for size in size_order if size in sizes_for_color}
+                for color, sizes_for_color in variants.items()
+            },
+        }
+
+    def invalidate_variant_matrix(self):
+        cache.delete(self.variant_matrix_cache_key)
+
     def get_total_stock(self):
         """Calculate total stock across all variants"""
-        from django.db.models import Sum
         return self.variants.aggregate(total_stock=Sum('stock'))['total_stock'] or 0
 
     def is_in_stock(self):
@@ -173,6 +269,8 @@ class Order(models.Model):
         ('delivered', 'Delivered'),
         ('cancelled', 'Cancelled'),
     ]
+    # Statuses that count towards revenue and sales figures
+    REVENUE_STATUSES = ['paid', 'processing', 'shipped', 'delivered']
 
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='orders')
     order_number = models.CharField(max_length=50, unique=True)
@@ -195,18 +293,21 @@ class Order(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Admin order list, newest first, with and without a status filter
+            models.Index(fields=['-created_at', '-id'], name='order_newest_idx'),
+            models.Index(fields=['status', '-created_at', '-id'], name='order_status_newest_idx'),
+            # A customer's recent orders, and covers their order stats without reading the rows
+            models.Index(fields=['user', '-created_at', 'status', 'total_price'], name='order_customer_idx'),
+        ]
 
     def __str__(self):
         return f"Order {self.order_number} - {self.user.username}"
 
     def save(self, *args, **kwargs):
         if not self.order_number:
-            import random
-            import string
-            order_number = ''.join(random.choices(string.ascii_uppercase + string.digits, k=10))
-            while Order.objects.filter(order_number=order_number).exists():
-                order_number = ''.join(random.choices(string.ascii_uppercase + string.digits, k=10))
-            self.order_number = order_number
+            # Unique by construction, so no existence check is needed
+            self.order_number = new_identifier()
         super().save(*args, **kwargs)
 
     def get_absolute_url(self):
@@ -216,6 +317,8 @@ class Order(models.Model):
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
     variant = models.ForeignKey(ProductVariant, on_delete=models.SET_NULL, null=True)
+    # Kept when the variant is deleted, so the sales rollups can still reverse the line
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, related_name='order_items')
     price = models.DecimalField(max_digits=10, decimal_places=2)
     quantity = models.PositiveIntegerField(default=1)
 
@@ -227,6 +330,45 @@ class OrderItem(models.Model):
         return self.price * self.quantity
 
 
+class OrderDailyStats(models.Model):
+    """
+    Orders and revenue per local day and status, kept up to date by
+    core.rollups as orders are placed and change status
+    """
+    date = models.DateField()
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    order_count = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['-date', 'status']
+        verbose_name_plural = 'Order daily stats'
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'status'], name='core_order_daily_stats_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.status}: {self.order_count} orders"
+
+
+class ProductDailySales(models.Model):
+    """Units sold and revenue per local day and product, counting orders in REVENUE_STATUSES"""
+    date = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_sales')
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['-date']
+        verbose_name_plural = 'Product daily sales'
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'product'], name='core_product_daily_sales_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.product_id}: {self.quantity} sold"
+
+
 class Wishlist(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='wishlist')
     products = models.ManyToManyField(Product, through='WishlistItem', related_name='wishlists')
@@ -251,3 +393,38 @@ class WishlistItem(models.Model):
 
     def __str__(self):
         return f"{self.product.name} in {self.wishlist.user.username}'s wishlist"
+
+
+class EmailOutbox(models.Model):
+    """
+    An email waiting to be sent. Rows are inserted in the same transaction as
+    the change they describe and delivered by the send_outbox_emails worker.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('dead', 'Dead'),
+    ]
+
+    recipient = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    available_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name_plural = 'Email outbox'
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='core_outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} to {self.recipient} - {self.get_status_display()}"
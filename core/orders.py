@@ -0,0 +1,109 @@
+"""
+Order placement: turns a paid cart into an Order in a single transaction
+"""
+from decimal import Decimal
+from django.db import models, transaction
+from django.db.models import Case, F, Q, When
+from .models import Order, OrderItem, Product, ProductVariant
+from .rollups import record_order_created
+
+
+class InsufficientStock(Exception):
+    """
+    Raised when one or more lines cannot be fulfilled. failed_lines holds one
+    dict per line: variant_id, variant (None if deleted), requested, available.
+    """
+
+    def __init__(self, failed_lines):
+        self.failed_lines = failed_lines
+        super().__init__(self.describe())
+
+    def describe(self):
+        parts = []
+        for line in self.failed_lines:
+            name = str(line['variant']) if line['variant'] else 'A removed product'
+            parts.append(f"{name} (requested {line['requested']}, {line['available']} left)")
+        return '; '.join(parts)
+
+
+class _StockChanged(Exception):
+    """Internal signal to roll back when the conditional stock UPDATE missed a row"""
+
+
+def place_order(user, cart_items, total_price, **order_fields):
+    """
+    Create an order with its items and decrement stock atomically.
+
+    cart_items is the pending_order list of {'variant_id', 'quantity', 'price'}.
+    All variants are locked with one SELECT ... FOR UPDATE, items are inserted
+    with bulk_create, and stock is decremented by a single conditional UPDATE
+    that refuses to take any variant below zero. Nothing is written if any
+    line fails; InsufficientStock then lists every failing line.
+    """
+    quantities = {}
+    for item in cart_items:
+        variant_id = int(item['variant_id'])
+        quantities[variant_id] = quantities.get(variant_id, 0) + int(item['quantity'])
+
+    try:
+        with transaction.atomic():
+            variants = ProductVariant.objects.select_for_update().select_related('product').in_bulk(
+                quantities.keys()
+            )
+
+            failed_lines = _check_stock(quantities, variants)
+            if failed_lines:
+                raise InsufficientStock(failed_lines)
+
+            order = Order.objects.create(user=user, total_price=Decimal(total_price), **order_fields)
+            items = OrderItem.objects.bulk_create([
+                OrderItem(
+                    order=order,
+                    variant=variants[int(item['variant_id'])],
+                    product_id=variants[int(item['variant_id'])].product_id,
+                    price=Decimal(item['price']),
+                    quantity=int(item['quantity']),
+                )
+                for item in cart_items
+            ])
+            record_order_created(order, items)
+
+            # One UPDATE for every line; each row only matches while it has enough stock
+            enough_stock = Q()
+            for variant_id, quantity in quantities.items():
+                enough_stock |= Q(pk=variant_id, stock__gte=quantity)
+            updated = ProductVariant.objects.filter(enough_stock).update(stock=Case(
+                *[When(pk=variant_id, then=F('stock') - quantity) for variant_id, quantity in quantities.items()],
+                default=F('stock'),
+                output_field=models.PositiveIntegerField(),
+            ))
+            if updated != len(quantities):
+                raise _StockChanged()
+
+            product_ids = {variant.product_id for variant in variants.values()}
+            transaction.on_commit(lambda: _invalidate_variant_matrices(product_ids))
+    except _StockChanged:
+        # Stock moved after the check (backends without row locks); report from the rolled-back state
+        fresh_variants = ProductVariant.objects.select_related('product').in_bulk(quantities.keys())
+        raise InsufficientStock(_check_stock(quantities, fresh_variants))
+
+    return order
+
+
+def _check_stock(quantities, variants):
+    failed_lines = []
+    for variant_id, requested in quantities.items():
+        variant = variants.get(variant_id)
+        if variant is None or variant.stock < requested:
+            failed_lines.append({
+                'variant_id': variant_id,
+                'variant': variant,
+                'requested': requested,
+                'available': variant.stock if variant else 0,
+            })
+    return failed_lines
+
+
+def _invalidate_variant_matrices(product_ids):
+    for product_id in product_ids:
+        Product(pk=product_id).invalidate_variant_matrix()
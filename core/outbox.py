@@ -0,0 +1,111 @@
+"""
+Delivery of queued EmailOutbox rows.
+
+Workers claim a batch of due rows, send them all over one SMTP connection,
+and record the outcome per row. Failed sends are retried with exponential
+backoff; after MAX_ATTEMPTS a row is dead-lettered for staff to inspect.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import EmailOutbox
+
+MAX_ATTEMPTS = 6
+RETRY_BACKOFF = timedelta(minutes=1)
+# Rows left in "sending" by a worker that died are picked up again after this
+STALE_SENDING_AFTER = timedelta(minutes=15)
+
+
+def claim_batch(batch_size):
+    """Mark up to batch_size due rows as sending and return them"""
+    with transaction.atomic():
+        queryset = EmailOutbox.objects.filter(
+            status='pending', available_at__lte=timezone.now()
+        ).order_by('available_at', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            queryset = queryset.select_for_update(skip_locked=True)
+        ids = list(queryset.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return []
+
+        # Conditional on status so concurrent workers never claim the same row twice. Without
+        # row locks another worker may have selected the same ids, so return only the rows
+        # this UPDATE stamped, like claim_next_intent checks its own update count.
+        claimed_at = timezone.now()
+        claimed = EmailOutbox.objects.filter(id__in=ids, status='pending').update(
+            status='sending', attempts=F('attempts') + 1, updated_at=claimed_at
+        )
+        if not claimed:
+            return []
+        return list(EmailOutbox.objects.filter(id__in=ids, status='sending', updated_at=claimed_at).order_by('id'))
+
+
+def requeue_stale():
+    now = timezone.now()
+    return EmailOutbox.objects.filter(
+        status='sending', updated_at__lt=now - STALE_SENDING_AFTER
+    ).update(status='pending', available_at=now, updated_at=now)
+
+
+def deliver_batch(emails):
+    """
+    Send a claimed batch over a single SMTP connection. Returns the number of
+    emails sent; failures are rescheduled or dead-lettered.
+    """
+    sent, failed = [], []
+    smtp = get_connection()
+    try:
+        smtp.open()
+    except Exception as e:
+        # Nothing can go out without a connection; retry the whole batch later
+        _reschedule(emails, f'Could not connect: {e}')
+        return 0
+
+    try:
+        for email in emails:
+            message = EmailMultiAlternatives(
+                subject=email.subject,
+                body=email.body,
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                to=[email.recipient],
+                connection=smtp,
+            )
+            if email.html_body:
+                message.attach_alternative(email.html_body, 'text/html')
+            try:
+                message.send()
+            except Exception as e:
+                email.last_error = str(e)
+                failed.append(email)
+            else:
+                sent.append(email)
+    finally:
+        smtp.close()
+
+    now = timezone.now()
+    EmailOutbox.objects.filter(id__in=[email.id for email in sent]).update(
+        status='sent', sent_at=now, last_error='', updated_at=now
+    )
+    if failed:
+        _reschedule(failed)
+    return len(sent)
+
+
+def _reschedule(emails, error=None):
+    """Back off or dead-letter each email; error overrides each email's own last_error"""
+    now = timezone.now()
+    for email in emails:
+        if error is not None:
+            email.last_error = error
+        email.updated_at = now
+        if email.attempts >= MAX_ATTEMPTS:
+            email.status = 'dead'
+        else:
+            email.status = 'pending'
+            email.available_at = now + RETRY_BACKOFF * 2 ** (email.attempts - 1)
+    EmailOutbox.objects.bulk_update(emails, ['status', 'available_at', 'last_error', 'updated_at'])
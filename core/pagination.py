@@ -0,0 +1,159 @@
+"""
+Keyset (cursor) pagination for storefront listings.
+
+Each page is addressed by an opaque cursor holding the sort key of the row on
+the page boundary, so pages are fetched with an indexed range scan instead of
+OFFSET and no COUNT(*) is ever issued.
+"""
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class InvalidCursor(Exception):
+    """Raised when a cursor token cannot be decoded for the current ordering"""
+
+
+class KeysetPage:
+    """A single page of results plus the cursors pointing to its neighbours"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset by a fixed ordering.
+    The ordering must end with a unique field (normally 'id' or '-id') so
+    rows sharing the same sort value still have a stable position.
+    """
+
+    def __init__(self, queryset, ordering, per_page=24):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.per_page = per_page
+        self.names = [name.lstrip('-') for name in self.ordering]
+        self.fields = [self._resolve_field(name) for name in self.names]
+
+    def _resolve_field(self, name):
+        # Sort keys may be model fields or annotations such as a search rank
+        annotation = self.queryset.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        return self.queryset.model._meta.get_field(name)
+
+    def page(self, cursor=None):
+        """Return the page addressed by cursor, or the first page if it is empty or invalid"""
+        if not cursor:
+            return self._fetch(None, backwards=False)
+
+        try:
+            backwards, values = self.decode_cursor(cursor)
+        except InvalidCursor:
+            return self._fetch(None, backwards=False)
+
+        return self._fetch(values, backwards)
+
+    def _fetch(self, values, backwards):
+        ordering = self._reverse(self.ordering) if backwards else self.ordering
+        queryset = self.queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self._after(values, backwards))
+
+        # Fetch one extra row to learn whether another page follows
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if backwards:
+            if not has_more:
+                # Walked back onto the first page; serve it in full
+                return self._fetch(None, backwards=False)
+            rows.reverse()
+            has_next, has_previous = True, True
+        else:
+            has_next, has_previous = has_more, values is not None
+
+        return KeysetPage(
+            rows,
+            next_cursor=self.encode_cursor(rows[-1]) if has_next and rows else None,
+            previous_cursor=self.encode_cursor(rows[0], backwards=True) if has_previous and rows else None,
+        )
+
+    def _after(self, values, backwards):
+        """
+        Build the row-value comparison "sort key comes after values" as
+        (a > x) OR (a = x AND b > y) ..., which every backend can index.
+        """
+        condition = Q()
+        for position, name in enumerate(self.ordering):
+            descending = name.startswith('-') != backwards
+            lookup = 'lt' if descending else 'gt'
+            clause = Q(**{f'{self.names[position]}__{lookup}': values[position]})
+            for previous_name, value in zip(self.names[:position], values[:position]):
+                clause &= Q(**{previous_name: value})
+            condition |= clause
+        return condition
+
+    @staticmethod
+    def _reverse(ordering):
+        return tuple(name[1:] if name.startswith('-') else f'-{name}' for name in ordering)
+
+    def encode_cursor(self, obj, backwards=False):
+        payload = {
+            'd': 'p' if backwards else 'n',
+            'v': [self._serialize(getattr(obj, name)) for name in self.names],
+        }
+        raw = json.dumps(payload, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    @staticmethod
+    def _serialize(value):
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        return str(value)
+
+    def decode_cursor(self, cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            payload = json.loads(raw)
+            direction, raw_values = payload['d'], payload['v']
+        except (binascii.Error, ValueError, TypeError, KeyError):
+            raise InvalidCursor(cursor)
+
+        if direction not in ('n', 'p') or not isinstance(raw_values, list) \
+                or len(raw_values) != len(self.fields):
+            raise InvalidCursor(cursor)
+
+        try:
+            values = [field.to_python(value) for field, value in zip(self.fields, raw_values)]
+        except ValidationError:
+            raise InvalidCursor(cursor)
+
+        if any(value is None for value in values):
+            raise InvalidCursor(cursor)
+
+        return direction == 'p', values
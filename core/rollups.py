@@ -0,0 +1,118 @@
+"""
+Incrementally maintained sales rollups.
+
+OrderDailyStats and ProductDailySales are adjusted with small deltas
+whenever an order is placed, changes status or is deleted, so dashboard
+reads never scan Order/OrderItem. Call these inside the transaction that
+makes the change. Anything that writes orders without going through them
+(raw SQL, data fixes) should be followed by manage.py backfill_order_stats.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import DecimalField, F, Sum
+from django.utils import timezone
+
+from .models import Order, OrderDailyStats, OrderItem, ProductDailySales
+
+
+def stats_date(order):
+    """The local calendar day an order is counted under"""
+    return timezone.localdate(order.created_at)
+
+
+def record_order_created(order, items):
+    """Count a newly placed order; items are its OrderItems"""
+    date = stats_date(order)
+    _bump_order_stats(date, order.status, 1, order.total_price)
+    if order.status in Order.REVENUE_STATUSES:
+        _bump_product_sales(date, _product_totals(items), 1)
+
+
+def record_status_change(order, old_status):
+    """Move an order between status buckets after order.status changed from old_status"""
+    if old_status == order.status:
+        return
+
+    date = stats_date(order)
+    _bump_order_stats(date, old_status, -1, -order.total_price)
+    _bump_order_stats(date, order.status, 1, order.total_price)
+
+    was_sale = old_status in Order.REVENUE_STATUSES
+    is_sale = order.status in Order.REVENUE_STATUSES
+    if was_sale != is_sale:
+        _bump_product_sales(date, _stored_product_totals(order), 1 if is_sale else -1)
+
+
+def record_order_deleted(order):
+    date = stats_date(order)
+    _bump_order_stats(date, order.status, -1, -order.total_price)
+    if order.status in Order.REVENUE_STATUSES:
+        _bump_product_sales(date, _stored_product_totals(order), -1)
+
+
+def update_order_statuses(queryset, status):
+    """Bulk status change that keeps the rollups in step, for admin actions"""
+    with transaction.atomic():
+        orders = list(queryset.select_for_update().only('id', 'status', 'total_price', 'created_at'))
+        Order.objects.filter(pk__in=[order.pk for order in orders]).update(status=status, updated_at=timezone.now())
+        for order in orders:
+            old_status, order.status = order.status, status
+            record_status_change(order, old_status)
+    return len(orders)
+
+
+def count_orders(status=None):
+    """Number of orders, optionally in one status, summed from the rollups instead of counting Order rows"""
+    queryset = OrderDailyStats.objects.all()
+    if status:
+        queryset = queryset.filter(status=status)
+    return queryset.aggregate(total=Sum('order_count'))['total'] or 0
+
+
+def _product_totals(items):
+    totals = defaultdict(lambda: [0, Decimal('0')])
+    for item in items:
+        if item.product_id is None:
+            continue
+        total = totals[item.product_id]
+        total[0] += item.quantity
+        total[1] += item.get_total_price()
+    return totals
+
+
+def _stored_product_totals(order):
+    rows = OrderItem.objects.filter(order=order, product__isnull=False).values('product_id').annotate(
+        units=Sum('quantity'),
+        sales=Sum(F('price') * F('quantity'), output_field=DecimalField(max_digits=14, decimal_places=2)),
+    )
+    return {row['product_id']: [row['units'], row['sales']] for row in rows}
+
+
+def _bump_order_stats(date, status, count, revenue):
+    _upsert_increment(
+        OrderDailyStats, {'date': date, 'status': status},
+        order_count=count, revenue=revenue,
+    )
+
+
+def _bump_product_sales(date, totals, sign):
+    for product_id, (quantity, revenue) in totals.items():
+        _upsert_increment(
+            ProductDailySales, {'date': date, 'product_id': product_id},
+            quantity=sign * quantity, revenue=sign * revenue,
+        )
+
+
+def _upsert_increment(model, key, **deltas):
+    """Add deltas to the row for key, creating it on first use"""
+    increments = {field: F(field) + delta for field, delta in deltas.items()}
+    if model.objects.filter(**key).update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**key, **deltas)
+    except IntegrityError:
+        # A concurrent transaction created the row first
+        model.objects.filter(**key).update(**increments)
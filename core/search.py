@@ -0,0 +1,163 @@
+"""
+Full-text product search.
+
+The backend is picked from the database vendor: SQLite uses an FTS5 virtual
+table kept in sync by signals, PostgreSQL uses a GIN index over a weighted
+tsvector expression. Any other database falls back to icontains filtering.
+Set PRODUCT_SEARCH_BACKEND to a dotted path to force a specific backend.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+SEARCH_TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def get_search_terms(query):
+    """Split raw user input into plain word tokens, dropping operators and quotes"""
+    return SEARCH_TERM_RE.findall(query.lower())
+
+
+class BaseSearchBackend:
+    """
+    Search backends filter a Product queryset down to matches and annotate
+    each row with search_rank, where a higher rank means more relevant.
+    """
+
+    def search(self, queryset, query):
+        raise NotImplementedError
+
+    def index_product(self, product):
+        """Add or refresh a single product in the index"""
+
+    def remove_product(self, product_id):
+        """Drop a single product from the index"""
+
+    def rebuild(self):
+        """Rebuild the whole index from the product table"""
+
+
+class IContainsSearchBackend(BaseSearchBackend):
+    """Fallback for databases without full-text support"""
+
+    def search(self, queryset, query):
+        condition = Q()
+        for term in get_search_terms(query):
+            condition &= Q(name__icontains=term) | Q(description__icontains=term)
+        if not condition:
+            return queryset.none()
+        return queryset.filter(condition).annotate(
+            search_rank=RawSQL('0', (), output_field=FloatField())
+        )
+
+
+class SQLiteFTSSearchBackend(BaseSearchBackend):
+    """SQLite FTS5 backend; matches are ranked with bm25, weighting name over description"""
+
+    table = 'core_product_fts'
+
+    def _match_expression(self, query):
+        # Quote every term so FTS5 syntax in user input is inert, then allow prefixes
+        return ' '.join(f'"{term}"*' for term in get_search_terms(query))
+
+    def search(self, queryset, query):
+        match = self._match_expression(query)
+        if not match:
+            return queryset.none()
+
+        # bm25() is lower-is-better, so negate it to keep "higher rank wins"
+        rank = RawSQL(
+            f'(SELECT -bm25({self.table}, 10.0, 1.0) FROM {self.table} '
+            f'WHERE {self.table} MATCH %s AND rowid = "core_product"."id")',
+            (match,),
+            output_field=FloatField(),
+        )
+        matches = RawSQL(
+            f'"core_product"."id" IN (SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s)',
+            (match,),
+            output_field=BooleanField(),
+        )
+        return queryset.filter(matches).annotate(search_rank=rank)
+
+    def index_product(self, product):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid = %s', [product.pk])
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, name, description) VALUES (%s, %s, %s)',
+                [product.pk, product.name, product.description],
+            )
+
+    def remove_product(self, product_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid = %s', [product_id])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, name, description) '
+                f'SELECT id, name, description FROM core_product'
+            )
+            cursor.execute(f"INSERT INTO {self.table} ({self.table}) VALUES ('optimize')")
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """
+    PostgreSQL backend backed by an expression GIN index, so the index is
+    maintained by the database itself on every insert, update and delete.
+    """
+
+    index_name = 'core_product_search_idx'
+    # Must stay identical to the expression indexed in migration 0004
+    vector = (
+        "setweight(to_tsvector('english', coalesce(\"core_product\".\"name\", '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(\"core_product\".\"description\", '')), 'B')"
+    )
+
+    def _tsquery(self, query):
+        return ' & '.join(f'{term}:*' for term in get_search_terms(query))
+
+    def search(self, queryset, query):
+        tsquery = self._tsquery(query)
+        if not tsquery:
+            return queryset.none()
+
+        # ts_rank() is float4, which comes back as a rounded decimal that no longer equals the
+        # stored rank; as float8 the keyset cursor value round-trips exactly
+        rank = RawSQL(
+            f"ts_rank({self.vector}, to_tsquery('english', %s))::double precision",
+            (tsquery,),
+            output_field=FloatField(),
+        )
+        matches = RawSQL(
+            f"({self.vector}) @@ to_tsquery('english', %s)",
+            (tsquery,),
+            output_field=BooleanField(),
+        )
+        return queryset.filter(matches).annotate(search_rank=rank)
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'REINDEX INDEX {self.index_name}')
+
+
+VENDOR_BACKENDS = {
+    'sqlite': SQLiteFTSSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_search_backend():
+    backend_path = getattr(settings, 'PRODUCT_SEARCH_BACKEND', None)
+    if backend_path:
+        return import_string(backend_path)()
+    return VENDOR_BACKENDS.get(connection.vendor, IContainsSearchBackend)()
+
+
+def search_products(queryset, query):
+    """Filter a Product queryset to matches for query, annotated with search_rank"""
+    return get_search_backend().search(queryset, query)
@@ -1,7 +1,9 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from core.models import Cart, Wishlist
+from core.models import Cart, Wishlist, Order, Product, ProductImage, ProductVariant
+from core.rollups import record_order_deleted
+from core.search import get_search_backend
 from users.models import UserProfile
 
 
@@ -12,3 +14,56 @@ def create_user_profile_and_cart(sender, instance, created, **kwargs):
         UserProfile.objects.create(user=instance)
         Cart.objects.create(user=instance)
         Wishlist.objects.create(user=instance)
+
+
+@receiver(post_save, sender=Product)
+def index_product_for_search(sender, instance, raw=False, **kwargs):
+    """Keep the full-text search index in step with product edits"""
+    if not raw:
+        get_search_backend().index_product(instance)
+    # The base price feeds every variant's effective price
+    instance.invalidate_variant_matrix()
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_from_search(sender, instance, **kwargs):
+    get_search_backend().remove_product(instance.pk)
+
+
+@receiver(pre_save, sender=ProductImage)
+def remember_image_product(sender, instance, raw=False, **kwargs):
+    """Note the product an existing image belonged to, in case it is being reassigned"""
+    if instance.pk and not raw:
+        instance._previous_product_id = ProductImage.objects.filter(
+            pk=instance.pk
+        ).values_list('product_id', flat=True).first()
+
+
+@receiver(post_save, sender=ProductImage)
+def sync_primary_image_on_save(sender, instance, raw=False, **kwargs):
+    """Refresh the denormalized primary image of the affected product(s)"""
+    if raw:
+        return
+    Product(pk=instance.product_id).refresh_primary_image()
+    previous_product_id = getattr(instance, '_previous_product_id', None)
+    if previous_product_id and previous_product_id != instance.product_id:
+        Product(pk=previous_product_id).refresh_primary_image()
+
+
+@receiver(post_delete, sender=ProductImage)
+def sync_primary_image_on_delete(sender, instance, **kwargs):
+    # The product may be mid-cascade-delete, so don't dereference instance.product
+    Product(pk=instance.product_id).refresh_primary_image()
+
+
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+def invalidate_variant_matrix(sender, instance, **kwargs):
+    """Drop the cached variant matrix of the variant's product"""
+    Product(pk=instance.product_id).invalidate_variant_matrix()
+
+
+@receiver(pre_delete, sender=Order)
+def remove_order_from_rollups(sender, instance, **kwargs):
+    """Take a deleted order out of the daily rollups while its items still exist"""
+    record_order_deleted(instance)
@@ -1,17 +1,31 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q, Count, Sum
+from django.db.models import Q, Count, Sum, Prefetch
 from django.utils import timezone
 from .models import Category, Product, ProductVariant, Cart, CartItem, Order, OrderItem, Wishlist, WishlistItem
 from .forms import AddToCartForm, CheckoutForm
 from .cart_utils import CartHandler
 from .emails import send_order_confirmation_email
+from .pagination import KeysetPaginator
+from .search import search_products
+
+PRODUCTS_PER_PAGE = 24
+
+# Keyset orderings for the catalog; each ends with the primary key so ties are stable.
+# Price sorts use min_price from with_card_data(), the "From" price the cards show.
+PRODUCT_SORT_ORDERINGS = {
+    'newest': ('-created_at', '-id'),
+    'price_low': ('min_price', 'id'),
+    'price_high': ('-min_price', '-id'),
+    'name': ('name', 'id'),
+    'relevance': ('-search_rank', '-id'),
+}
 
 
 def home(request):
-    featured_products = Product.objects.filter(available=True, featured=True)[:8]
-    new_arrivals = Product.objects.filter(available=True)[:8]
+    featured_products = Product.objects.filter(available=True, featured=True).with_card_data()[:8]
+    new_arrivals = Product.objects.filter(available=True).with_card_data()[:8]
     categories = Category.objects.all()[:6]
 
     context = {
@@ -23,13 +37,14 @@ def home(request):
 
 
 def product_list(request):
-    products = Product.objects.filter(available=True)
+    products = Product.objects.filter(available=True).select_related('category')
     categories = Category.objects.all()
 
     # Get filter parameters
     category_slug = request.GET.get('category')
     search_query = request.GET.get('q', '')
-    sort_by = request.GET.get('sort', 'newest')
+    sort_by = request.GET.get('sort', 'relevance' if search_query else 'newest')
+    category = None
 
     # Filter by category
     if category_slug:
@@ -38,24 +53,27 @@ def product_list(request):
 
     # Search functionality
     if search_query:
-        products = products.filter(
-            Q(name__icontains=search_query) |
-            Q(description__icontains=search_query)
-        )
-
-    # Sorting
-    if sort_by == 'price_low':
-        products = products.order_by('price')
-    elif sort_by == 'price_high':
-        products = products.order_by('-price')
-    elif sort_by == 'name':
-        products = products.order_by('name')
-    else:  # newest
-        products = products.order_by('-created_at')
+        products = search_products(products, search_query)
+
+    # Sorting and cursor pagination
+    if sort_by not in PRODUCT_SORT_ORDERINGS or (sort_by == 'relevance' and not search_query):
+        sort_by = 'newest'
+    paginator = KeysetPaginator(
+        products.with_card_data(), PRODUCT_SORT_ORDERINGS[sort_by], per_page=PRODUCTS_PER_PAGE
+    )
+    page = paginator.page(request.GET.get('cursor'))
+
+    # Preserve the active filters in the next/previous links
+    query_params = request.GET.copy()
+    query_params.pop('cursor', None)
+    query_params['sort'] = sort_by
 
     context = {
-        'products': products,
+        'products': page,
+        'page': page,
+        'query_params': query_params.urlencode(),
         'categories': categories,
+        'category': category,
         'category_slug': category_slug,
         'search_query': search_query,
         'sort_by': sort_by,
@@ -64,51 +82,37 @@ def product_list(request):
 
 
 def product_detail(request, slug):
-    product = get_object_or_404(Product, slug=slug, available=True)
-    images = product.images.all()
-    variants = product.variants.filter(stock__gt=0)
+    product = get_object_or_404(Product.objects.select_related('category'), slug=slug, available=True)
+    images = list(product.images.all())
 
-    # Group variants by color
-    colors = variants.values_list('color', flat=True).distinct()
+    # color x size -> [variant id, stock, price], from one query and cached per product
+    variant_matrix = product.get_variant_matrix()
 
-    # Get all available sizes for default color
-    available_variants = {}
-    for color in colors:
-        available_variants[color] = {
-            variant.size: variant
-            for variant in variants.filter(color=color)
-        }
-
-    # Get available sizes for first color
-    first_color = colors.first() if colors else None
-    available_sizes = variants.filter(color=first_color).values_list('size', flat=True).distinct() if first_color else []
-
-    # Get first available variant as default
-    first_variant = variants.first() if variants else None
+    # Default to the first available size of the first color
+    first_color = variant_matrix['colors'][0][0] if variant_matrix['colors'] else None
+    sizes_for_first_color = variant_matrix['variants'].get(first_color, {})
+    available_sizes = list(sizes_for_first_color)
+    first_variant_id = sizes_for_first_color[available_sizes[0]][0] if available_sizes else None
 
     context = {
         'product': product,
         'images': images,
-        'variants': variants,
-        'available_variants': available_variants,
-        'colors': colors,
+        'variant_matrix': variant_matrix,
+        'colors': variant_matrix['colors'],
         'available_sizes': available_sizes,
         'first_color': first_color,
-        'first_variant': first_variant,
+        'first_variant_id': first_variant_id,
     }
     return render(request, 'core/product_detail.html', context)
 
 
 def cart_detail(request):
-    cart_handler = CartHandler(request)
-    cart_items = cart_handler.get_items()
-    total_price = cart_handler.get_total_price()
-    total_items = cart_handler.get_total_items()
+    cart = CartHandler(request).get_snapshot()
 
     context = {
-        'cart_items': cart_items,
-        'total_price': total_price,
-        'total_items': total_items,
+        'cart_items': cart.lines,
+        'total_price': cart.total_price,
+        'total_items': cart.total_items,
     }
     return render(request, 'core/cart.html', context)
 
@@ -195,12 +199,9 @@ def checkout(request):
         return redirect('users:profile_edit')
 
     # Get cart using CartHandler for consistency
-    cart_handler = CartHandler(request)
-    cart_items = cart_handler.get_items()
-    total_price = cart_handler.get_total_price()
-    total_items = cart_handler.get_total_items()
+    cart = CartHandler(request).get_snapshot()
 
-    if total_items == 0:
+    if cart.total_items == 0:
         messages.warning(request, 'Your cart is empty.')
         return redirect('core:product_list')
 
@@ -208,19 +209,19 @@ def checkout(request):
     request.session['pending_order'] = {
         'cart_items': [
             {
-                'variant_id': item.variant.id if hasattr(item, 'variant') else item['variant'].id,
-                'quantity': item.quantity,
-                'price': str(item.variant.get_price() if hasattr(item, 'variant') else item['variant'].get_price())
+                'variant_id': line.variant.id,
+                'quantity': line.quantity,
+                'price': str(line.variant.get_price()),
             }
-            for item in cart_items
+            for line in cart
         ],
-        'total_price': str(total_price),
+        'total_price': str(cart.total_price),
     }
 
     context = {
-        'cart_items': cart_items,
-        'total_price': total_price,
-        'total_items': total_items,
+        'cart_items': cart.lines,
+        'total_price': cart.total_price,
+        'total_items': cart.total_items,
         'user_profile': request.user.profile,
     }
     return render(request, 'core/checkout.html', context)
@@ -246,7 +247,9 @@ def order_success(request):
 @login_required
 def wishlist(request):
     wishlist, created = Wishlist.objects.get_or_create(user=request.user)
-    wishlist_items = wishlist.items.select_related('product__category').all()
+    wishlist_items = wishlist.items.prefetch_related(
+        Prefetch('product', queryset=Product.objects.select_related('category').with_card_data())
+    )
 
     context = {
         'wishlist_items': wishlist_items,
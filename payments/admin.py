@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import Payment
+from .models import Payment, PaymentIntent
 
 
 @admin.register(Payment)
@@ -32,3 +32,13 @@ class PaymentAdmin(admin.ModelAdmin):
         return format_html('<span style="color: red;">✗</span>')
     is_successful.short_description = 'Success'
     is_successful.allow_tags = True
+
+
+@admin.register(PaymentIntent)
+class PaymentIntentAdmin(admin.ModelAdmin):
+    list_display = ['reference', 'user', 'total_price', 'status', 'attempts', 'order', 'created_at', 'queued_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['reference', 'user__username', 'user__email', 'order__order_number']
+    readonly_fields = ['reference', 'user', 'cart_items', 'total_price', 'transaction_data', 'order',
+                       'attempts', 'last_error', 'created_at', 'updated_at', 'queued_at']
+    list_select_related = ['user', 'order']
@@ -0,0 +1,209 @@
+"""
+Background fulfillment of paid checkouts.
+
+The Paystack webhook and the browser callback only mark a PaymentIntent as
+queued. The process_payments worker claims queued intents one at a time and
+turns them into orders, so no request waits on Paystack, SMTP or the order
+writes, and an order is still created if the shopper never comes back.
+"""
+import hashlib
+import hmac
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.cart_utils import clear_user_cart
+from core.models import Order
+from core.emails import send_checkout_emails
+from core.orders import InsufficientStock, place_order
+from .models import Payment, PaymentIntent
+from .paystack import PaystackError, get_paystack_client
+
+MAX_FULFILLMENT_ATTEMPTS = 5
+RETRY_BACKOFF = timedelta(seconds=30)
+# A worker that dies mid-fulfillment leaves its intent in "processing"; after
+# this long another worker may pick it up again
+STALE_PROCESSING_AFTER = timedelta(minutes=10)
+
+FAILED_TRANSACTION_STATUSES = ('failed', 'abandoned', 'reversed')
+
+
+def is_valid_signature(body, signature):
+    """Check Paystack's X-Paystack-Signature: HMAC-SHA512 of the raw body with the secret key"""
+    if not signature:
+        return False
+    expected = hmac.new(settings.PAYSTACK_SECRET_KEY.encode(), body, hashlib.sha512).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+def queue_intent(reference, transaction_data=None):
+    """
+    Queue an intent for the worker with a single UPDATE. The callback queues
+    without data; a signed webhook also attaches the transaction so the
+    worker can skip the verify call. Returns False for unknown references and
+    intents that are already being fulfilled or settled.
+    """
+    now = timezone.now()
+    updates = {'status': 'queued', 'queued_at': now, 'updated_at': now}
+    statuses = ['pending']
+    if transaction_data is not None:
+        updates['transaction_data'] = transaction_data
+        statuses.append('queued')
+    return PaymentIntent.objects.filter(reference=reference, status__in=statuses).update(**updates) == 1
+
+
+def claim_next_intent():
+    """Move the oldest due intent from queued to processing and return it, or None"""
+    while True:
+        with transaction.atomic():
+            queryset = PaymentIntent.objects.filter(
+                status='queued', queued_at__lte=timezone.now()
+            ).order_by('queued_at')
+            if connection.features.has_select_for_update_skip_locked:
+                queryset = queryset.select_for_update(skip_locked=True)
+            intent = queryset.first()
+            if intent is None:
+                return None
+
+            # The conditional UPDATE also keeps workers apart on databases without row locks
+            claimed = PaymentIntent.objects.filter(pk=intent.pk, status='queued').update(
+                status='processing', attempts=F('attempts') + 1, updated_at=timezone.now()
+            )
+        if claimed:
+            intent.status = 'processing'
+            intent.attempts += 1
+            return intent
+
+
+def requeue_stale_intents():
+    now = timezone.now()
+    return PaymentIntent.objects.filter(
+        status='processing', updated_at__lt=now - STALE_PROCESSING_AFTER
+    ).update(status='queued', queued_at=now, updated_at=now)
+
+
+def fulfill_intent(intent):
+    """
+    Turn a claimed intent into a paid order. Transient failures put it back on
+    the queue with a backoff; anything Paystack or the stock levels rule out
+    marks it failed with last_error for staff to follow up.
+
+    Fulfillment is idempotent per reference: an already fulfilled reference
+    returns its order without calling Paystack, duplicates running at the
+    same time queue up on the intent's row lock, and the unique
+    Payment.reference catches any that slip past on databases without one.
+    """
+    order = get_fulfilled_order(intent.reference)
+    if order is not None:
+        _mark_fulfilled(intent, order)
+        return order
+
+    try:
+        data = intent.transaction_data or _verify_transaction(intent.reference)
+    except PaystackError as e:
+        return retry_or_fail(intent, f'Could not verify payment: {e}')
+
+    transaction_status = data.get('status')
+    if transaction_status in FAILED_TRANSACTION_STATUSES:
+        return _mark_failed(intent, f'Paystack reports the payment as {transaction_status}.')
+    if transaction_status != 'success':
+        return retry_or_fail(intent, f'Payment is still {transaction_status}.')
+    if int(data.get('amount') or 0) != intent.amount_kobo:
+        return _mark_failed(intent, 'The amount paid does not match the order total.')
+
+    user = intent.user
+    profile = getattr(user, 'profile', None)
+    try:
+        with transaction.atomic():
+            locked = PaymentIntent.objects.select_for_update().only('status', 'order').get(pk=intent.pk)
+            if locked.status == 'fulfilled':
+                return Order.objects.get(pk=locked.order_id)
+
+            order = place_order(
+                user,
+                intent.cart_items,
+                intent.total_price,
+                full_name=user.get_full_name() or user.username,
+                email=user.email,
+                phone=profile.phone if profile else '',
+                address=profile.address if profile else '',  # This will be the location
+                city='',  # Not needed
+                state='',  # Not needed
+                postal_code='',  # Not needed
+                country='Ghana',
+                status='paid'  # Set to paid immediately
+            )
+
+            payment = Payment.objects.create(
+                order=order,
+                amount=order.total_price,
+                reference=intent.reference,
+                status='success',
+                paystack_transaction_id=data.get('id'),
+                authorization_code=(data.get('authorization') or {}).get('authorization_code'),
+                response_data=data,
+                verified_at=timezone.now()
+            )
+
+            _mark_fulfilled(intent, order)
+
+            # Queued in the outbox, so they are only sent if the order commits
+            send_checkout_emails(order, payment)
+    except InsufficientStock as e:
+        return _mark_failed(intent, f'Your payment was received, but some items are no longer available: {e.describe()}.')
+    except IntegrityError:
+        # Another worker recorded this reference first; everything above was rolled back
+        order = get_fulfilled_order(intent.reference)
+        if order is None:
+            raise
+        _mark_fulfilled(intent, order)
+        return order
+
+    clear_user_cart(user)
+    return order
+
+
+def get_fulfilled_order(reference):
+    """The order already paid under reference, or None; one lookup on the unique reference index"""
+    payment = Payment.objects.select_related('order').filter(reference=reference).first()
+    return payment.order if payment else None
+
+
+def retry_or_fail(intent, error):
+    """Requeue with a growing delay, or give up once the attempts are used up"""
+    if intent.attempts >= MAX_FULFILLMENT_ATTEMPTS:
+        return _mark_failed(intent, error)
+
+    _transition(
+        intent,
+        status='queued',
+        queued_at=timezone.now() + RETRY_BACKOFF * 2 ** (intent.attempts - 1),
+        last_error=error,
+    )
+
+
+def _mark_fulfilled(intent, order):
+    _transition(intent, status='fulfilled', order=order, last_error='')
+
+
+def _mark_failed(intent, error):
+    _transition(intent, status='failed', last_error=error)
+
+
+def _transition(intent, **updates):
+    """Update the intent unless it is already fulfilled, so a late duplicate never undoes a fulfillment"""
+    for field, value in updates.items():
+        setattr(intent, field, value)
+    PaymentIntent.objects.filter(pk=intent.pk).exclude(status='fulfilled').update(
+        updated_at=timezone.now(), **updates
+    )
+
+
+def _verify_transaction(reference):
+    response_data = get_paystack_client().verify_transaction(reference)
+    if not response_data.get('status'):
+        raise PaystackError(response_data.get('message', 'Unknown error'))
+    return response_data['data']
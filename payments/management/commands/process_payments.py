@@ -0,0 +1,49 @@
+"""
+Management command that fulfills paid checkouts queued by the Paystack
+webhook and the payment callback
+"""
+import time
+
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand, CommandError
+from payments.fulfillment import claim_next_intent, fulfill_intent, requeue_stale_intents, retry_or_fail
+
+
+class Command(BaseCommand):
+    help = 'Create orders for payment intents queued by the Paystack webhook or callback'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain the queue and exit instead of polling')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds to sleep when the queue is empty')
+
+    def handle(self, *args, **options):
+        if isinstance(caches['default'], LocMemCache):
+            # Fulfillment clears cart badges and cached stock that the web process reads
+            raise CommandError(
+                'process_payments needs a cache shared with the web server; '
+                'LocMemCache is private to each process. Use the default database cache or set REDIS_URL.'
+            )
+
+        while True:
+            requeue_stale_intents()
+            intent = claim_next_intent()
+
+            if intent is None:
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+                continue
+
+            try:
+                order = fulfill_intent(intent)
+            except Exception as e:
+                # Unexpected errors (e.g. a dropped database connection) are retried like network errors
+                retry_or_fail(intent, f'Unexpected error: {e}')
+                self.stderr.write(self.style.ERROR(f'{intent.reference}: {e}'))
+                continue
+
+            if order is not None:
+                self.stdout.write(self.style.SUCCESS(f'{intent.reference}: created order {order.order_number}'))
+            else:
+                self.stdout.write(self.style.WARNING(f'{intent.reference}: {intent.get_status_display()} - {intent.last_error}'))
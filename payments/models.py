@@ -1,4 +1,5 @@
 from django.db import models
+from django.contrib.auth.models import User
 from core.models import Order
 
 
@@ -33,3 +34,52 @@ class Payment(models.Model):
 
     def is_successful(self):
         return self.status == 'success'
+
+
+class PaymentIntent(models.Model):
+    """
+    A checkout waiting on Paystack, stored when payment is initialized so the
+    order can be fulfilled without the shopper's session. Webhooks and the
+    browser callback only queue it; the process_payments worker fulfills it.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Awaiting payment'),
+        ('queued', 'Queued for fulfillment'),
+        ('processing', 'Processing'),
+        ('fulfilled', 'Fulfilled'),
+        ('failed', 'Failed'),
+    ]
+
+    reference = models.CharField(max_length=200, unique=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='payment_intents')
+    cart_items = models.JSONField()
+    total_price = models.DecimalField(max_digits=10, decimal_places=2)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+
+    # Transaction data from a signed webhook; when absent the worker verifies with Paystack
+    transaction_data = models.JSONField(blank=True, null=True)
+    order = models.OneToOneField(
+        Order, on_delete=models.SET_NULL, blank=True, null=True, related_name='payment_intent'
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    queued_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'queued_at'], name='payments_intent_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"Payment intent {self.reference} - {self.get_status_display()}"
+
+    @property
+    def amount_kobo(self):
+        return int(self.total_price * 100)
+
+    def is_settled(self):
+        return self.status in ('fulfilled', 'failed')
@@ -0,0 +1,118 @@
+"""
+HTTP client for the Paystack API.
+
+One client (and so one pooled keep-alive session) is shared per process, so
+checkouts reuse open TLS connections to api.paystack.co instead of paying a
+fresh handshake each time. Every call is bounded by connect/read timeouts;
+idempotent GETs are retried with exponential backoff. Set PAYSTACK_CLIENT to
+a dotted path to swap in a different client (e.g. a local fake in tests).
+"""
+import logging
+import time
+
+import requests
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import Signal, receiver
+from django.utils.module_loading import import_string
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+# Sent after every Paystack call with method, path, status_code (None on
+# network errors) and duration in seconds; hook a metrics backend up to it
+paystack_request_finished = Signal()
+
+
+class PaystackError(Exception):
+    """Raised when Paystack cannot be reached or returns an unusable response"""
+
+
+class PaystackClient:
+    """
+    Thin wrapper around a pooled requests.Session. Methods return the decoded
+    JSON body; callers check body['status'] as before.
+    """
+
+    retry_statuses = (429, 500, 502, 503, 504)
+
+    def __init__(self, secret_key=None, base_url=None, connect_timeout=None,
+                 read_timeout=None, max_retries=None, backoff_factor=None, pool_size=None):
+        self.secret_key = secret_key or settings.PAYSTACK_SECRET_KEY
+        self.base_url = (base_url or settings.PAYSTACK_BASE_URL).rstrip('/')
+        self.timeout = (
+            connect_timeout or settings.PAYSTACK_CONNECT_TIMEOUT,
+            read_timeout or settings.PAYSTACK_READ_TIMEOUT,
+        )
+        self.session = self._build_session(
+            settings.PAYSTACK_MAX_RETRIES if max_retries is None else max_retries,
+            settings.PAYSTACK_RETRY_BACKOFF if backoff_factor is None else backoff_factor,
+            pool_size or settings.PAYSTACK_POOL_SIZE,
+        )
+
+    def _build_session(self, max_retries, backoff_factor, pool_size):
+        # Read errors and retryable statuses are only retried for GET; a POST
+        # is only retried when the connection failed before it was sent
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=self.retry_statuses,
+            allowed_methods=frozenset(['GET']),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({
+            'Authorization': f'Bearer {self.secret_key}',
+            'Content-Type': 'application/json',
+        })
+        return session
+
+    def request(self, method, path, **kwargs):
+        """Send a request and return the decoded JSON body"""
+        kwargs.setdefault('timeout', self.timeout)
+        status_code = None
+        started = time.monotonic()
+        try:
+            response = self.session.request(method, f'{self.base_url}{path}', **kwargs)
+            status_code = response.status_code
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            # JSON decode errors subclass RequestException in requests >= 2.27
+            raise PaystackError(str(e)) from e
+        finally:
+            duration = time.monotonic() - started
+            logger.info('Paystack %s %s -> %s in %.0fms', method, path, status_code, duration * 1000)
+            paystack_request_finished.send(
+                sender=self.__class__, method=method, path=path,
+                status_code=status_code, duration=duration,
+            )
+
+    def initialize_transaction(self, data):
+        return self.request('POST', '/transaction/initialize', json=data)
+
+    def verify_transaction(self, reference):
+        return self.request('GET', f'/transaction/verify/{reference}')
+
+
+_client = None
+
+
+def get_paystack_client():
+    """Return the process-wide client, built from PAYSTACK_CLIENT on first use"""
+    global _client
+    if _client is None:
+        _client = import_string(settings.PAYSTACK_CLIENT)()
+    return _client
+
+
+@receiver(setting_changed)
+def reset_paystack_client(setting, **kwargs):
+    """Rebuild the client when tests override any PAYSTACK_* setting"""
+    global _client
+    if setting.startswith('PAYSTACK_'):
+        _client = None
@@ -5,6 +5,7 @@ app_name = 'payments'
 
 urlpatterns = [
     path('initialize/', views.initialize_payment, name='initialize_payment'),
-    path('verify/<str:reference>/', views.verify_payment, name='verify_payment'),
+    path('status/<str:reference>/', views.payment_status, name='payment_status'),
     path('callback/', views.payment_callback, name='payment_callback'),
+    path('webhook/', views.paystack_webhook, name='paystack_webhook'),
 ]
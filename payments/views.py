@@ -1,20 +1,14 @@
-import requests
-import hashlib
-import random
-import string
+import json
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.conf import settings
-from django.utils import timezone
-from core.models import Order
-from .models import Payment
-from core.emails import send_payment_confirmation_email
-
-
-def generate_reference():
-    """Generate a unique transaction reference"""
-    return ''.join(random.choices(string.ascii_uppercase + string.digits, k=16))
+from django.http import HttpResponse, HttpResponseBadRequest
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from core.identifiers import new_identifier
+from .fulfillment import is_valid_signature, queue_intent
+from .models import PaymentIntent
+from .paystack import PaystackError, get_paystack_client
 
 
 @login_required
@@ -31,15 +25,21 @@ def initialize_payment(request):
         messages.error(request, 'Please update your profile first.')
         return redirect('users:profile_edit')
 
-    # Generate a unique reference
-    reference = generate_reference()
-    while Payment.objects.filter(reference=reference).exists():
-        reference = generate_reference()
+    # Generate a unique reference; no existence check needed
+    reference = new_identifier()
 
-    # Calculate amount in kobo (Paystack uses lowest currency unit)
+    # Keep the cart with the reference so the order can be created without this session
     from decimal import Decimal
-    total_price = Decimal(pending_order['total_price'])
-    amount_kobo = int(total_price * 100)
+    intent = PaymentIntent.objects.create(
+        reference=reference,
+        user=request.user,
+        cart_items=pending_order['cart_items'],
+        total_price=Decimal(pending_order['total_price']),
+    )
+    total_price = intent.total_price
+
+    # Calculate amount in kobo (Paystack uses lowest currency unit)
+    amount_kobo = intent.amount_kobo
 
     # Prepare Paystack request data
     paystack_data = {
@@ -59,19 +59,8 @@ def initialize_payment(request):
         }
     }
 
-    # Make request to Paystack
-    headers = {
-        'Authorization': f'Bearer {settings.PAYSTACK_SECRET_KEY}',
-        'Content-Type': 'application/json'
-    }
-
     try:
-        response = requests.post(
-            'https://api.paystack.co/transaction/initialize',
-            json=paystack_data,
-            headers=headers
-        )
-        response_data = response.json()
+        response_data = get_paystack_client().initialize_transaction(paystack_data)
 
         if response_data.get('status'):
             # Store payment reference in session
@@ -84,106 +73,55 @@ def initialize_payment(request):
             messages.error(request, f"Payment initialization failed: {response_data.get('message', 'Unknown error')}")
             return redirect('core:cart_detail')
 
-    except requests.exceptions.RequestException as e:
+    except PaystackError as e:
         messages.error(request, f"Network error: {str(e)}")
         return redirect('core:cart_detail')
 
 
-@login_required
-def verify_payment(request, reference):
-    """Verify payment with Paystack and create order"""
-    # Get pending order from session
-    pending_order = request.session.get('pending_order')
-    if not pending_order:
-        messages.error(request, 'No pending order found.')
-        return redirect('core:home')
-
-    # Make request to Paystack to verify transaction
-    headers = {
-        'Authorization': f'Bearer {settings.PAYSTACK_SECRET_KEY}',
-        'Content-Type': 'application/json'
-    }
+@csrf_exempt
+@require_POST
+def paystack_webhook(request):
+    """
+    Receive Paystack events. Only the signature check and one UPDATE happen
+    here; the process_payments worker creates the order.
+    """
+    if not is_valid_signature(request.body, request.headers.get('X-Paystack-Signature')):
+        return HttpResponseBadRequest('Invalid signature')
 
     try:
-        response = requests.get(
-            f'https://api.paystack.co/transaction/verify/{reference}',
-            headers=headers
-        )
-        response_data = response.json()
-
-        if response_data.get('status') and response_data['data']['status'] == 'success':
-            from decimal import Decimal
-            from core.models import ProductVariant, OrderItem
-            from core.cart_utils import CartHandler
-
-            # Create the order NOW (after payment is confirmed)
-            profile = request.user.profile
-            order = Order.objects.create(
-                user=request.user,
-                total_price=Decimal(pending_order['total_price']),
-                full_name=request.user.get_full_name() or request.user.username,
-                email=request.user.email,
-                phone=profile.phone,
-                address=profile.address,  # This will be the location
-                city='',  # Not needed
-                state='',  # Not needed
-                postal_code='',  # Not needed
-                country='Ghana',
-                status='paid'  # Set to paid immediately
-            )
-
-            # Create order items
-            for item_data in pending_order['cart_items']:
-                variant = ProductVariant.objects.get(id=item_data['variant_id'])
-                OrderItem.objects.create(
-                    order=order,
-                    variant=variant,
-                    price=Decimal(item_data['price']),
-                    quantity=item_data['quantity']
-                )
-
-                # Update stock
-                variant.stock -= item_data['quantity']
-                variant.save()
-
-            # Create payment record
-            payment = Payment.objects.create(
-                order=order,
-                amount=order.total_price,
-                reference=reference,
-                status='success',
-                paystack_transaction_id=response_data['data']['id'],
-                authorization_code=response_data['data'].get('authorization', {}).get('authorization_code'),
-                response_data=response_data,
-                verified_at=timezone.now()
-            )
-
-            # Clear cart
-            cart_handler = CartHandler(request)
-            cart_handler.clear()
-
-            # Clear session data
-            del request.session['pending_order']
-            if 'payment_reference' in request.session:
-                del request.session['payment_reference']
-
-            # Send emails
-            send_order_confirmation_email(order)
-            send_payment_confirmation_email(order, payment)
-
-            messages.success(request, f'Payment successful! Order {order.order_number} has been placed.')
-            return redirect('core:order_detail', order_number=order.order_number)
-        else:
-            messages.error(request, "Payment verification failed. Please try again.")
-            return redirect('core:cart_detail')
+        event = json.loads(request.body)
+    except ValueError:
+        return HttpResponseBadRequest('Invalid payload')
 
-    except requests.exceptions.RequestException as e:
-        messages.error(request, f"Network error during verification: {str(e)}")
-        return redirect('core:cart_detail')
-    except Exception as e:
-        messages.error(request, f"Error creating order: {str(e)}")
+    if event.get('event') == 'charge.success':
+        data = event.get('data') or {}
+        queue_intent(data.get('reference'), data)
+
+    return HttpResponse(status=200)
+
+
+@login_required
+def payment_status(request, reference):
+    """Show the state of a checkout; the page refreshes itself until the order is ready"""
+    intent = get_object_or_404(
+        PaymentIntent.objects.select_related('order'), reference=reference, user=request.user
+    )
+
+    if intent.status == 'fulfilled':
+        # Clear session data
+        if request.session.get('payment_reference') == reference:
+            for key in ('pending_order', 'payment_reference', 'payment_amount'):
+                request.session.pop(key, None)
+
+        messages.success(request, f'Payment successful! Order {intent.order.order_number} has been placed.')
+        return redirect('core:order_detail', order_number=intent.order.order_number)
+
+    if intent.status == 'failed':
+        messages.error(request, f'{intent.last_error} Please contact us with reference {reference}.')
         return redirect('core:cart_detail')
 
+    return render(request, 'payments/status.html', {'intent': intent})
+
 
 @login_required
 def payment_callback(request):
@@ -198,5 +136,6 @@ def payment_callback(request):
         messages.error(request, 'No transaction reference found.')
         return redirect('core:home')
 
-    # Verify the payment
-    return verify_payment(request, ref_to_use)
+    # Queue fulfillment in case the webhook has not arrived (a no-op if it has)
+    queue_intent(ref_to_use)
+    return redirect('payments:payment_status', reference=ref_to_use)
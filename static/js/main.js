@@ -28,34 +28,57 @@ function initializeImageGallery() {
 }
 
 // Variant Selector Function
+// Reads the matrix rendered by product_detail: {variants: {color: {size: [id, stock, price]}}}
 function initializeVariantSelectors() {
     const colorSelect = document.getElementById('colorSelect');
     const sizeSelect = document.getElementById('sizeSelect');
+    const variantIdInput = document.getElementById('variantId');
+    const matrixElement = document.getElementById('variant-matrix');
 
-    if (colorSelect && sizeSelect) {
-        // Store available variants data
-        const availableVariants = JSON.parse(
-            document.querySelector('[data-variants]')?.getAttribute('data-variants') || '{}'
-        );
-
-        colorSelect.addEventListener('change', function() {
-            const selectedColor = this.value;
-
-            // Update available sizes based on selected color
-            if (availableVariants[selectedColor]) {
-                const availableSizes = Object.keys(availableVariants[selectedColor]);
-
-                // Clear and repopulate size select
-                sizeSelect.innerHTML = '';
-                availableSizes.forEach(size => {
-                    const option = document.createElement('option');
-                    option.value = size;
-                    option.textContent = size;
-                    sizeSelect.appendChild(option);
-                });
-            }
-        });
+    if (!colorSelect || !sizeSelect || !variantIdInput || !matrixElement) {
+        return;
     }
+
+    const matrix = JSON.parse(matrixElement.textContent);
+    const variants = matrix.variants || {};
+    const priceElement = document.getElementById('variantPrice');
+    const quantityInput = document.querySelector('#addToCartForm input[name="quantity"]');
+
+    function selectVariant() {
+        const entry = (variants[colorSelect.value] || {})[sizeSelect.value];
+        if (!entry) {
+            return;
+        }
+
+        const [variantId, stock, price] = entry;
+        variantIdInput.value = variantId;
+        if (priceElement) {
+            priceElement.textContent = price;
+        }
+        if (quantityInput) {
+            quantityInput.max = stock;
+        }
+    }
+
+    colorSelect.addEventListener('change', function() {
+        const previousSize = sizeSelect.value;
+        const availableSizes = Object.keys(variants[this.value] || {});
+
+        // Clear and repopulate size select, keeping the current size if possible
+        sizeSelect.innerHTML = '';
+        availableSizes.forEach(size => {
+            const option = document.createElement('option');
+            option.value = size;
+            option.textContent = size;
+            option.selected = size === previousSize;
+            sizeSelect.appendChild(option);
+        });
+
+        selectVariant();
+    });
+
+    sizeSelect.addEventListener('change', selectVariant);
+    selectVariant();
 }
 
 // Auto-dismiss alerts after 5 seconds
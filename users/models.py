@@ -1,6 +1,29 @@
+from decimal import Decimal
+
 from django.db import models
+from django.db.models import Count, Max, Q, Sum
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 
+from core.models import Order
+
+
+class UserProfileQuerySet(models.QuerySet):
+    def with_order_stats(self):
+        """
+        Annotate order_count, lifetime_spend (over orders that count as sales)
+        and last_order_at from one grouped join on the customer's orders.
+        """
+        return self.annotate(
+            order_count=Count('user__orders'),
+            lifetime_spend=Coalesce(
+                Sum('user__orders__total_price', filter=Q(user__orders__status__in=Order.REVENUE_STATUSES)),
+                Decimal('0'),
+                output_field=models.DecimalField(max_digits=12, decimal_places=2),
+            ),
+            last_order_at=Max('user__orders__created_at'),
+        )
+
 
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
@@ -15,6 +38,8 @@ class UserProfile(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = UserProfileQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.user.username}'s Profile"
 